@@ -1,25 +1,43 @@
+import hmac
 import json
 import logging
+import mimetypes
 import os
-import shutil
 import tempfile
-from datetime import datetime
+import threading
+import time
+import zipfile
 import pandas as pd
 import geopandas as gpd
 from dotenv import load_dotenv
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Response, render_template, request, jsonify, send_file, url_for
 from flask_compress import Compress
-from werkzeug.utils import secure_filename
-from py.read_write_df import StatusTableManager, gdf_to_shapefile, df_to_excel_for_export
+from werkzeug.utils import safe_join
+from py.read_write_df import (StatusTableManager, METADATA_REGISTRY, gdf_to_shapefile, df_to_excel_for_export,
+                              update_last_modified, read_data_version, df_to_feather, feather_to_df)
+from py.tracking_cache import TrackingDataCache
+from py.http_cache import (PayloadCache, FileValidatorCache, Payload, conditional_payload_response,
+                           is_not_modified, not_modified_response, set_validators)
+from py.precompress import pick_precompressed, write_precompressed, find_precompressed
+from py.json_stream import check_backend, iter_json_records
+from py.table_index import TableIndex
+from py.artifact_cache import ArtifactCache
+from py.jobs import JobManager
+from py.publish import Publication
+from py.delta import diff_frames, apply_changes, change_record_path, write_change_record
+from py.backups import BackupStore
+from py.uploads import read_parts, read_upload, UploadError
+from py.validation import ValidationPlan
+from py.events import ChangeFeed, resume_version
 
 
-DEBUG_MODE = True
-logging.basicConfig(level=logging.DEBUG if DEBUG_MODE else logging.INFO)
 load_dotenv(override=True)  # Load environment variables from .env file
+DEBUG_MODE = os.getenv("DEBUG_MODE", "false").lower() in ("1", "true", "yes")
+logging.basicConfig(level=logging.DEBUG if DEBUG_MODE else logging.INFO, force=True)
 app = Flask(__name__)
 Compress(app)
+mimetypes.add_type("application/vnd.apache.arrow.file", ".arrow")
 app.secret_key = os.getenv("SECRET_KEY")
-# socketio = SocketIO(app, cors_allowed_origins='*', path='/socket.io')  # or another custom path
 
 
 MANUAL_UPDATES_FOLDER = "data/manual_updates"
@@ -27,9 +45,59 @@ EXCEL_DIR = os.path.join(app.root_path, "data", "tables")
 EXCEL_FILE = os.path.join(EXCEL_DIR, "IA_BLE_Tracking.xlsx")
 BACKUP_LOC = "data/_backups"
 TRACKING_FILE = "data/spatial/IA_BLE_Tracking.geojson"
+TRACKING_ARROW = "data/spatial/IA_BLE_Tracking_attributes.arrow"
 SHEET_NAME = "Tracking_Main"
 TABLE_METADATA = "data/IA_BLE_Tracking_metadata.json"
 SHAPEFILE = "data/IA_BLE_Tracking.shp"
+LAST_MODIFIED_MARKER = "data/tables/last_modified.yaml"
+CHANGES_DIR = "data/_changes"
+SOURCES_FILE = os.path.normpath(os.path.join(app.root_path, "data/mapbox_metadata", "mapbox_sources.json"))
+# Encoder for the table JSON: 'pandas' (default), 'orjson' (needs the orjson package) or 'json'
+JSON_ENCODER = check_backend(os.getenv("JSON_ENCODER", "pandas"))
+
+
+def is_newer(path, than_path):
+    """True if path exists and was written no earlier than than_path."""
+    try:
+        return os.stat(path).st_mtime_ns >= os.stat(than_path).st_mtime_ns
+    except FileNotFoundError:
+        return os.path.exists(path)
+
+
+def load_tracking_table(path):
+    """Read the tracking attributes (no geometry), typed and sorted for the table."""
+    if is_newer(TRACKING_ARROW, path):
+        # Columnar copy written by the publish paths, memory-mapped without GDAL or text parsing
+        df = feather_to_df(TRACKING_ARROW)
+    else:
+        df = gpd.read_file(path, ignore_geometry=True)
+        if 'geometry' in df.columns:
+            df = df.drop(columns='geometry')
+
+    with StatusTableManager(TABLE_METADATA) as manager:
+        df = manager.enforce_types(df, "geojson")
+        df = manager.sort_rows(df)
+    return df
+
+
+TRACKING_CACHE = TrackingDataCache(TRACKING_FILE, load_tracking_table,
+                                   depends_on=[TRACKING_ARROW, TABLE_METADATA, LAST_MODIFIED_MARKER])
+PAYLOAD_CACHE = PayloadCache()
+EXPORT_CACHE = ArtifactCache(os.path.join(app.root_path, "data", "exports"))
+SERVED_VALIDATORS = FileValidatorCache()
+BACKUPS = BackupStore(BACKUP_LOC)
+JOB_MANAGER = JobManager(os.path.join(app.root_path, "data", "_jobs"))
+PUBLISH_LOCK_FILE = "data/.publish.lock"
+UPLOAD_VALIDATION_SECONDS = float(os.getenv("UPLOAD_VALIDATION_SECONDS", 10))
+# Uploads compress their outputs under the publish lock, so they trade a little size for speed;
+# the offline builds (precompress.py, the CLI scripts) keep the maximum levels
+PUBLISH_BROTLI_QUALITY = int(os.getenv("PUBLISH_BROTLI_QUALITY", 5))
+PUBLISH_GZIP_LEVEL = int(os.getenv("PUBLISH_GZIP_LEVEL", 6))
+CHANGE_FEED = ChangeFeed(LAST_MODIFIED_MARKER, CHANGES_DIR)
+# Each open event stream holds a server thread here (gunicorn.conf.py adds a thread per slot);
+# asgi.py serves them on the event loop instead
+EVENT_STREAMS = threading.BoundedSemaphore(int(os.getenv("EVENT_STREAMS", 2)))
+EVENT_STREAM_SECONDS = float(os.getenv("EVENT_STREAM_SECONDS", 300))
 
 
 # Homepage route
@@ -39,10 +107,7 @@ def home():
 
 @app.route("/mapbox-token/")
 def mapbox_token():
-    logging.debug("Getting mapbox token...")
-    token = os.getenv("MAPBOX_TOKEN")
-    logging.debug(f"MB token: {token}")
-    return jsonify({"MAPBOX_TOKEN": token})
+    return jsonify({"MAPBOX_TOKEN": os.getenv("MAPBOX_TOKEN")})
 
 @app.route('/metadata-columns')
 def metadata_columns():
@@ -50,24 +115,22 @@ def metadata_columns():
     # If none is provided, default to 'geojson'.
     requested_format = request.args.get('source_file_format', default='geojson')
 
-    with open(TABLE_METADATA) as f:
-        metadata = json.load(f)
+    payload = PAYLOAD_CACHE.get(("metadata-columns", requested_format), [TABLE_METADATA],
+                                lambda: build_metadata_columns(requested_format))
+    return conditional_payload_response(payload)
 
-    columns_metadata = {k: v for k, v in metadata["columns"].items()}
 
-    filtered_meta = {}
-    for col_key, col_info in columns_metadata.items():
-        if requested_format in col_info:
-            filtered_meta[col_key] = {requested_format: col_info[requested_format]}
+def build_metadata_columns(requested_format):
+    table_metadata = METADATA_REGISTRY.get(TABLE_METADATA)
+    columns_metadata = table_metadata.to_dict()["columns"]
 
     # Construct the order based on the requested format
-    filtered_order = [col_info[requested_format] for col_info in columns_metadata.values() if
-                      requested_format in col_info]
+    filtered_order = list(table_metadata.column_orders.get(requested_format, ()))
 
-    return jsonify({
+    return json.dumps({
         "meta": columns_metadata,
         "order": filtered_order  # Include the key order explicitly
-    })
+    }).encode("utf-8")
 
 
 @app.route('/verify-password', methods=['POST'])
@@ -92,74 +155,172 @@ def verify_password():
 @app.route('/data-table.json', methods=['GET'])
 def get_table_data():
     try:
-        df = gpd.read_file(TRACKING_FILE)
-        if 'geometry' in df.columns:
-            df = df.drop(columns='geometry')
-
-        with StatusTableManager(TABLE_METADATA) as manager:
-            df = manager.enforce_types(df, "geojson")
-            df = manager.sort_rows(df)
+        entry = TRACKING_CACHE.get()
+
+        # Return the stored JSON, or a 304 if the client already has this version
+        if entry.json_bytes is not None:
+            return conditional_payload_response(Payload(entry.json_bytes, entry.etag, entry.last_modified))
+        if is_not_modified(None, entry.last_modified):
+            return not_modified_response(None, entry.last_modified)
+
+        # First request for this version: stream it, and keep the result once complete
+        def generate():
+            chunks = []
+            for chunk in iter_json_records(entry.frame, backend=JSON_ENCODER):
+                chunks.append(chunk)
+                yield chunk
+            entry.store_json(b"".join(chunks))
+
+        response = Response(generate(), mimetype="application/json")
+        return set_validators(response, None, entry.last_modified)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        table_data = df.to_dict(orient='records')
 
-        # Return as JSON
-        return jsonify(table_data)
+def parse_datatables_args(args):
+    """Read the DataTables server-side parameters (columns[0][data], order[0][dir], ...) from a request."""
+    columns = []
+    i = 0
+    while f"columns[{i}][data]" in args:
+        columns.append({
+            "data": args.get(f"columns[{i}][data]"),
+            "searchable": args.get(f"columns[{i}][searchable]", "true") == "true",
+            "orderable": args.get(f"columns[{i}][orderable]", "true") == "true",
+            "search": args.get(f"columns[{i}][search][value]", ""),
+        })
+        i += 1
+
+    order = []
+    i = 0
+    while f"order[{i}][column]" in args:
+        col_idx = args.get(f"order[{i}][column]", type=int)
+        if col_idx is not None and 0 <= col_idx < len(columns) and columns[col_idx]["orderable"]:
+            order.append((columns[col_idx]["data"], args.get(f"order[{i}][dir]", "asc") != "desc"))
+        i += 1
+
+    return {
+        "draw": args.get("draw", default=0, type=int),
+        "start": max(args.get("start", default=0, type=int), 0),
+        "length": args.get("length", default=-1, type=int),
+        "global_search": args.get("search[value]", ""),
+        "column_searches": {c["data"]: c["search"] for c in columns if c["search"]},
+        "searchable": [c["data"] for c in columns if c["searchable"]] or None,
+        "order": order,
+    }
+
+
+@app.route('/data-table/server', methods=['GET', 'POST'])
+def get_table_page():
+    """DataTables server-side processing: filter, order and page the cached tracking table."""
+    try:
+        params = parse_datatables_args(request.values)
+        entry = TRACKING_CACHE.get()
+        index = entry.derived("table_index", TableIndex)
+        page, records_filtered = index.query(params["start"], params["length"], params["global_search"],
+                                             params["column_searches"], params["order"], params["searchable"])
+
+        header = json.dumps({"draw": params["draw"], "recordsTotal": len(index),
+                             "recordsFiltered": records_filtered})
+        records = b"".join(iter_json_records(page, backend=JSON_ENCODER))
+        body = header[:-1].encode("utf-8") + b', "data": ' + records + b"}"
+        return Response(body, mimetype="application/json")
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/events')
+def data_events():
+    """
+    Server-sent data-version events; the browser resumes from Last-Event-ID when it reconnects,
+    or from ?since=, the X-Data-Version its attributes were loaded at, before its first event.
+    """
+    last_version = resume_version(request.headers.get("Last-Event-ID"), request.args.get("since"))
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if not EVENT_STREAMS.acquire(blocking=False):
+        # Every stream slot is taken; ask the browser to retry later instead of holding a thread.
+        # It reconnects with the same ?since= (or Last-Event-ID), so nothing published meanwhile is lost.
+        return Response(b"retry: 30000\n\n", mimetype="text/event-stream", headers=headers)
+
+    def generate():
+        try:
+            yield from CHANGE_FEED.stream(last_version, max_seconds=EVENT_STREAM_SECONDS)
+        finally:
+            EVENT_STREAMS.release()
+
+    return Response(generate(), mimetype="text/event-stream", headers=headers)
+
+
+@app.route('/api/tracking-rows', methods=['GET'])
+def tracking_rows():
+    """Current attribute rows for the requested project_ids, as CSV like the served attributes file."""
+    project_ids = request.args.getlist("project_id")
+    # Read the version before the data, so the rows are never older than the version reported
+    version = CHANGE_FEED.version()
+    entry = TRACKING_CACHE.get()
+    rows = entry.frame[entry.frame["project_id"].astype("string").isin(project_ids)]
+    return Response(rows.to_csv(index=False), mimetype="text/csv",
+                    headers={"Cache-Control": "no-store", "X-Data-Version": str(version)})
+
+
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    return jsonify({"data_version": read_data_version(LAST_MODIFIED_MARKER), "tracking": TRACKING_CACHE.stats(),
+                    "exports": EXPORT_CACHE.stats(), "jobs": JOB_MANAGER.stats(), "backups": BACKUPS.stats()})
+
+
 @app.route('/export-excel', methods=['GET'])
 def export_excel():
     try:
-        # Load the GeoJSON data
-        gdf = gpd.read_file(TRACKING_FILE)
-        if 'geometry' in gdf.columns:
-            df = gdf.drop(columns='geometry')
-        else:
-            df = gdf
-
-        with StatusTableManager(TABLE_METADATA) as manager:
-            df = manager.rename_columns(df, "excel", "geojson")
-            df = manager.enforce_types(df, "excel")
-            df = manager.sort_rows(df)
-
-        # Define merged headers
-        merged_headers = [
-            {'text': 'Delivery Area Info', 'colspan': 3},
-            {'text': 'MIP Task Status', 'colspan': 3},
-            {'text': 'Model Manager Uploads', 'colspan': 5},
-            {'text': 'Details', 'colspan': len(df.columns) - 11},
-        ]
-
-        # Generate the Excel file
-        excel_output_dir = os.path.join(app.root_path, 'data', 'exports')
-        os.makedirs(excel_output_dir, exist_ok=True)
-        excel_filename = 'IA_BLE_Tracking.xlsx'
-        df_to_excel_for_export(df, out_loc=excel_output_dir, filename=excel_filename, sheetname='Tracking_Main',
-                               merged_headers=merged_headers)
-
-        # Send the file as a response
-        return send_from_directory(excel_output_dir, excel_filename, as_attachment=True)
+        # Built once per data version; later downloads are served from the cached file
+        excel_path = EXPORT_CACHE.get("IA_BLE_Tracking.xlsx", TRACKING_CACHE.data_version(), build_excel_export)
+        return send_file(excel_path, as_attachment=True, download_name="IA_BLE_Tracking.xlsx")
 
     except Exception as e:
         logging.error(f"Error generating Excel file: {e}")
         return jsonify({'error': str(e)}), 500
 
 
+def build_excel_export(out_path):
+    """Write the tracking table as the formatted Excel export."""
+    # Load the GeoJSON data
+    gdf = gpd.read_file(TRACKING_FILE)
+    if 'geometry' in gdf.columns:
+        df = gdf.drop(columns='geometry')
+    else:
+        df = gdf
+
+    with StatusTableManager(TABLE_METADATA) as manager:
+        df = manager.rename_columns(df, "excel", "geojson")
+        df = manager.enforce_types(df, "excel")
+        df = manager.sort_rows(df)
+
+    # Define merged headers
+    merged_headers = [
+        {'text': 'Delivery Area Info', 'colspan': 3},
+        {'text': 'MIP Task Status', 'colspan': 3},
+        {'text': 'Model Manager Uploads', 'colspan': 5},
+        {'text': 'Details', 'colspan': len(df.columns) - 11},
+    ]
+
+    # Generate the Excel file
+    out_dir, out_file = os.path.split(out_path)
+    df_to_excel_for_export(df, out_loc=out_dir, filename=out_file, sheetname='Tracking_Main',
+                           merged_headers=merged_headers)
+
+
 @app.route("/api/sources", methods=["GET"])
 def get_sources_metadata():
     """Load sources from a JSON file and return them as a response."""
     # data/mapbox_metadata/mapbox_sources.json
-    sources_file = os.path.normpath(os.path.join(
-        app.root_path, "data/mapbox_metadata", "mapbox_sources.json"))
-
-    if not os.path.exists(sources_file):
+    if not os.path.exists(SOURCES_FILE):
         return jsonify({"error": "Sources file not found"}), 404
 
-    with open(sources_file, "r") as f:
-        sources = json.load(f)
+    def build_sources():
+        with open(SOURCES_FILE, "rb") as f:
+            return f.read()
 
-    return jsonify(sources)
+    payload = PAYLOAD_CACHE.get("api-sources", [SOURCES_FILE], build_sources)
+    return conditional_payload_response(payload)
 
 
 @app.route("/served/<path:filename>")
@@ -167,152 +328,370 @@ def serve_data(filename):
     data_dir = os.path.join(app.root_path, "data")
     if not os.path.exists(data_dir):
         return jsonify({"error": "Data directory not found"}), 404
-    if not os.path.isfile(os.path.join(data_dir, filename)):
+    # Read before the file is opened, so the file is never older than the version reported;
+    # the page passes it to /events?since= to get whatever is published after it
+    version = CHANGE_FEED.version()
+    response = send_precompressed(data_dir, filename)
+    if response is None:
         return jsonify({"error": "File not found"}), 404
-    return send_from_directory(data_dir, filename)
+    response.headers["X-Data-Version"] = str(version)
+    return response
+
+
+def send_precompressed(directory, filename):
+    """
+    Send a file, preferring a precompressed .br/.gz sibling the client accepts.
+    Returns None if the file does not exist.
+    """
+    file_path = safe_join(directory, filename)
+    if file_path is None or not os.path.isfile(file_path):
+        return None
+
+    served_path, encoding = pick_precompressed(file_path, request.accept_encodings)
+    etag, last_modified = SERVED_VALIDATORS.get(served_path)
+    if is_not_modified(etag, last_modified):
+        response = not_modified_response(etag, last_modified)
+    else:
+        mimetype = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+        response = set_validators(send_file(served_path, mimetype=mimetype, etag=False), etag, last_modified)
+        if encoding:
+            # Already compressed, Flask-Compress skips responses with a Content-Encoding
+            response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
 
 
-@app.route('/export-shape', methods=['POST'])
-def export_shp(gdf):  # TODO Add functions to read GeoJSON and export Excel files for user downoad
+@app.route('/export-shape', methods=['GET', 'POST'])
+def export_shp():
     try:
-        logging.debug("Updating SHAPEFILE file...")
-        logging.debug(f"GDF has columns: {hasattr(gdf, 'columns')}")
+        zip_path = EXPORT_CACHE.get("IA_BLE_Tracking_shp.zip", TRACKING_CACHE.data_version(), build_shapefile_export)
+        return send_file(zip_path, as_attachment=True, download_name="IA_BLE_Tracking_shp.zip")
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def build_shapefile_export(out_path):
+    """Write the tracking layer as a zipped shapefile."""
+    logging.debug("Updating SHAPEFILE file...")
+    gdf = gpd.read_file(TRACKING_FILE)
+
+    with StatusTableManager(TABLE_METADATA) as manager:
+        gdf = manager.rename_columns(gdf, "shapefile", "geojson")
+        gdf = manager.enforce_types(gdf, "shapefile")
+        gdf = manager.sort_rows(gdf)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        gdf_to_shapefile(gdf, os.path.join(temp_dir, os.path.basename(SHAPEFILE)))
+        with zipfile.ZipFile(out_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for name in sorted(os.listdir(temp_dir)):
+                zf.write(os.path.join(temp_dir, name), arcname=name)
+
+
+def read_request_upload():
+    """Read the request's files into memory. Returns (parts, error response); parts is None on error."""
+    if 'files' not in request.files:
+        return None, (jsonify({'success': False, 'message': 'No files part in the request'}), 400)
+
+    files = [f for f in request.files.getlist('files') if f.filename]
+    if not files:
+        return None, (jsonify({'success': False, 'message': 'No files selected'}), 400)
+
+    try:
+        return read_parts(files), None
+    except UploadError as e:
+        return None, (jsonify({'success': False, 'message': str(e)}), 400)
+
+
+@app.route('/update-tracking-geojson', methods=['POST'])
+def update_tracking_attributes():
+    # Uploads are read from the request in memory; nothing is written until the publication
+    parts, error = read_request_upload()
+    if error:
+        return error
+    payload, status = process_tracking_upload(parts, mode=request.values.get('mode', 'replace'))
+    return jsonify(payload), status
+
+
+def process_tracking_upload(parts, progress=None, mode="replace"):
+    """
+    Validate an uploaded shapefile or GeoJSON and publish it as the tracking data.
+    :param parts: uploaded files held in memory, {file name: bytes}: shapefile parts, a zipped
+                  shapefile or a GeoJSON
+    :param progress: optional callback(fraction, message)
+    :param mode: 'replace' publishes the upload as is; 'incremental' applies only the rows
+                 it inserts, updates or deletes to the current data
+    :return: (response payload, HTTP status)
+    """
+    if progress is None:
+        progress = lambda fraction, message=None: None
+    if mode not in ("replace", "incremental"):
+        return {'success': False, 'message': f'Unknown upload mode: {mode}'}, 400
+
+    try:
+        # Read the upload straight from memory
+        progress(0.1, "Reading upload")
+        try:
+            gdf, source_format = read_upload(parts)
+        except UploadError as e:
+            return {'success': False, 'message': str(e)}, 400
+
+        # Process the GeoDataFrame
+        if 'huc8' in gdf.columns and 'HUC8' not in gdf.columns:
+            gdf['HUC8'] = gdf['huc8']
+        elif 'HUC8' not in gdf.columns and 'huc8' not in gdf.columns:
+            return {'success': False, 'message': 'Required column "HUC8" not found in the data'}, 400
+
+        # Get metadata columns from the shared registry
+        table_metadata = METADATA_REGISTRY.get(TABLE_METADATA)
+        colnames = {c for c in table_metadata.column_orders[source_format] if c}
+        logging.debug(f"Column names to match: {colnames}")
+
+        # Count matching columns
+        gdf_cols = set(gdf.columns)
+        meta_cols = set(colnames)
+        matching_cols = gdf_cols.intersection(meta_cols)
+        if len(matching_cols) < 2:
+            logging.warning(f"Upload did not have enough matching cols: {matching_cols}")
+            return {'success': False, 'message': f'At least two metadata columns are '
+                                                 f'required, {len(matching_cols)} provided'}, 400
+
+        # Rows without a project_id are skipped; validation errors still give the others' row in the upload
+        row_numbers = None
+        if 'project_id' in gdf.columns:
+            keep = gdf['project_id'].notnull().to_numpy()
+            row_numbers = keep.nonzero()[0] + 1
+            gdf = gdf[keep]
 
         with StatusTableManager(TABLE_METADATA) as manager:
-            gdf = manager.rename_columns(gdf, "shapefile", "geojson")
-            gdf = manager.enforce_types(gdf, "shapefile")
+            gdf = manager.rename_columns(gdf, "geojson", source_format)
+
+            # Check the raw values before enforce_types coerces them, and before anything is written
+            progress(0.2, "Validating")
+            report = ValidationPlan(manager.table_metadata, "geojson").validate(
+                gdf, time_budget=UPLOAD_VALIDATION_SECONDS, row_numbers=row_numbers)
+            if not report.ok:
+                return {'success': False, 'message': report.summary(), 'validation': report.to_dict()}, 422
+
+            progress(0.3, "Formatting attributes")
+            gdf = manager.enforce_types(gdf, "geojson")
             gdf = manager.sort_rows(gdf)
 
-        # Save updated Excel
-        gdf_to_shapefile(gdf, SHAPEFILE)
+        return publish_tracking_gdf(gdf, progress, mode, note="upload")
+    except Exception as e:
+        logging.error(f"Error processing uploaded files: {e}")
+        return {'success': False, 'message': f'Error processing files: {str(e)}'}, 500
+
+
+def publish_tracking_gdf(gdf, progress=None, mode="replace", note=None):
+    """
+    Publish a typed, sorted tracking GeoDataFrame as the served GeoJSON, CSV and Arrow files.
+    :param gdf: tracking data with GeoJSON column names
+    :param progress: optional callback(fraction, message)
+    :param mode: 'replace' or 'incremental' (apply only the rows that differ)
+    :param note: stored with the change record and backup, e.g. 'upload'
+    :return: (response payload, HTTP status)
+    """
+    if progress is None:
+        progress = lambda fraction, message=None: None
+
+    save_dir, attributes_filename = os.path.split(TRACKING_FILE)
+    attributes_filename, ext = os.path.splitext(attributes_filename)
+    attributes_csv = os.path.join(save_dir, attributes_filename + "_attributes.csv")
+
+    # Read, diff and write under the publish lock, so a publication in between cannot be overwritten
+    with Publication(PUBLISH_LOCK_FILE, LAST_MODIFIED_MARKER, bump_version=update_last_modified) as pub:
+        # Diff against the current data, keyed on project_id (and HUC8 if needed)
+        progress(0.4, "Comparing with current data")
+        with StatusTableManager(TABLE_METADATA) as manager:
+            current = manager.enforce_types(gpd.read_file(TRACKING_FILE), "geojson")
+            changes = diff_frames(current, gdf)
+            logging.info(f"Upload changes ({mode}): {changes.summary()}")
+            if changes.empty:
+                return {'success': True, 'message': 'No changes to publish', 'changes': changes.summary()}, 200
+            if mode == "incremental":
+                gdf = manager.sort_rows(apply_changes(current, gdf, changes))
+
+        # Attributes for the CSV and Arrow copies
+        df = gdf.drop(columns='geometry')
+
+        # Write every output to staging, then swap them in together
+        progress(0.5, "Writing outputs")
+        # The lock makes the version this publication creates the next one
+        previous_version = read_data_version(LAST_MODIFIED_MARKER)
+        version = previous_version + 1
+
+        # Snapshot the data being replaced; content already in the store is only hashed
+        BACKUPS.snapshot(TRACKING_FILE, data_version=previous_version, note="before " + (note or mode),
+                         compressed=find_precompressed(TRACKING_FILE, "gzip"))
+
+        staged = [pub.stage(TRACKING_FILE), pub.stage(attributes_csv), pub.stage(TRACKING_ARROW)]
+        gdf.to_file(staged[0], driver='GeoJSON')
+        df.to_csv(staged[1], index=False)
+        df_to_feather(df, staged[2])
+        for staged_path in staged:
+            write_precompressed(staged_path, brotli_quality=PUBLISH_BROTLI_QUALITY, gzip_level=PUBLISH_GZIP_LEVEL)
+
+        # Back up the new GeoJSON by reusing its gzip sibling, and record the change set
+        BACKUPS.snapshot(staged[0], name=os.path.basename(TRACKING_FILE), data_version=version, note=note or mode,
+                         compressed=find_precompressed(staged[0], "gzip"))
+        write_change_record(changes, pub.stage(change_record_path(CHANGES_DIR, version)), version, mode)
+        progress(0.8, "Publishing")
+    TRACKING_CACHE.bump()
 
-        return jsonify({'success': True})
+    # Clients on /events get the new version and its changed project_ids from the change record
+    CHANGE_FEED.notify()
+
+    return {'success': True, 'message': 'GeoJSON updated successfully', 'changes': changes.summary()}, 200
+
+
+def check_upload_password(password) -> bool:
+    actual_password = os.getenv("UPLOAD_PASSWORD")
+    return bool(actual_password) and password is not None and hmac.compare_digest(str(password), actual_password)
+
+
+@app.route('/api/backups', methods=['GET'])
+def list_backups():
+    return jsonify({"backups": BACKUPS.list(request.args.get("name")), "stats": BACKUPS.stats()})
+
+
+@app.route('/api/backups/<snapshot_id>/restore', methods=['POST'])
+def restore_backup(snapshot_id):
+    data = request.get_json(silent=True) or {}
+    if not check_upload_password(data.get("password")):
+        return jsonify({'success': False, 'message': 'Invalid password'}), 403
+
+    entry = BACKUPS.get(snapshot_id)
+    if entry is None or entry["name"] != os.path.basename(TRACKING_FILE):
+        return jsonify({'success': False, 'message': f'No tracking backup {snapshot_id}'}), 404
+
+    try:
+        gdf, _ = read_upload({entry["name"]: BACKUPS.read(snapshot_id)})
+        with StatusTableManager(TABLE_METADATA) as manager:
+            gdf = manager.enforce_types(gdf, "geojson")
+            gdf = manager.sort_rows(gdf)
+        payload, status = publish_tracking_gdf(gdf, mode="replace", note=f"restore {snapshot_id}")
+        return jsonify(payload), status
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        logging.error(f"Error restoring backup {snapshot_id}: {e}")
+        return jsonify({'success': False, 'message': f'Error restoring backup: {str(e)}'}), 500
 
 
-# Allowed extensions for file uploads
-ALLOWED_EXTENSIONS = {'geojson', 'shp', 'dbf', 'shx', 'prj', 'cpg'}
+# Background jobs: the same work as the routes above, run off the request thread.
+# Each route returns 202 with a job id; poll /jobs/<id> and fetch /jobs/<id>/result when done.
+EXPORT_JOBS = {
+    "export-excel": ("IA_BLE_Tracking.xlsx", build_excel_export),
+    "export-shape": ("IA_BLE_Tracking_shp.zip", build_shapefile_export),
+}
 
 
-def allowed_file(filename):
-    return '.' in filename and \
-        filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+def run_export_job(name, build, progress):
+    progress(0.1, f"Building {name}")
+    path = EXPORT_CACHE.get(name, TRACKING_CACHE.data_version(), build)
+    return {"path": path, "download_name": name}
 
 
-@app.route('/update-tracking-geojson', methods=['POST'])
-def update_tracking_attributes():
-    if 'files' not in request.files:
-        return jsonify({'success': False, 'message': 'No files part in the request'}), 400
+class UploadRejected(ValueError):
+    """A rejected upload; details (e.g. the validation report) are kept on the failed job."""
 
-    files = request.files.getlist('files')
-    if not files or len(files) == 0:
-        return jsonify({'success': False, 'message': 'No files selected'}), 400
+    def __init__(self, payload):
+        super().__init__(payload['message'])
+        self.details = payload.get('validation')
 
-    # Save the uploaded files to a temporary directory
-    with tempfile.TemporaryDirectory() as temp_dir:
-        try:
-            for file in files:
-                if allowed_file(file.filename):
-                    filename = secure_filename(file.filename)
-                    file.save(os.path.join(temp_dir, filename))
-                else:
-                    return jsonify({'success': False, 'message': f'File type not allowed: {file.filename}'}), 400
-
-            # Process the files
-            shp_files = [f for f in os.listdir(temp_dir) if f.endswith('.shp')]
-            if shp_files:
-                # There should be at least one .shp file
-                shp_file_path = os.path.join(temp_dir, shp_files[0])
-
-                # Read the shapefile using GeoPandas
-                gdf = gpd.read_file(shp_file_path)
-
-                # Process the GeoDataFrame
-                if 'huc8' in gdf.columns and 'HUC8' not in gdf.columns:
-                    gdf['HUC8'] = gdf['huc8']
-                elif 'HUC8' not in gdf.columns and 'huc8' not in gdf.columns:
-                    return jsonify({'success': False, 'message': 'Required column "HUC8" not found in the data'}), 400
-
-                # Get metadata columns
-                # Load metadata directly
-                with open(TABLE_METADATA) as f:
-                    metadata = json.load(f)
-
-                columns_metadata = {k: v for k, v in metadata["columns"].items()}
-                # print(f"Col dict: {columns_metadata}")
-                colnames = set()
-                for k, file_info in columns_metadata.items():
-                    if file_info.get("shapefile"):
-                        colnames.add(file_info.get("shapefile"))
-                print(f"Column names to match: {colnames}")
-
-                # Count matching columns
-                gdf_cols = set(gdf.columns)
-                meta_cols = set(colnames)
-                matching_cols = gdf_cols.intersection(meta_cols)
-                if len(matching_cols) < 2:
-                    logging.warning(f"Upload did not have enough matching cols: {matching_cols}")
-                    return jsonify({'success': False, 'message': f'At least two metadata columns are '
-                                                                 f'required, {len(matching_cols)} provided'}), 400
-
-                gdf = gdf[gdf['project_id'].notnull()]
-
-                # Optionally, process metadata or enforce column types using StatusTableManager
-                with StatusTableManager(TABLE_METADATA) as manager:
-                    gdf = manager.rename_columns(gdf, "geojson", "shapefile")
-                    gdf = manager.enforce_types(gdf, "geojson")
-                    gdf = manager.sort_rows(gdf)
-
-                # Save out the new temp GeoJSON
-                temp_geojson_path = os.path.join(temp_dir, 'temp_IA_BLE_Tracking.geojson')
-                gdf.to_file(temp_geojson_path, driver='GeoJSON')
-
-                # Backup the old GeoJSON
-                os.makedirs(BACKUP_LOC, exist_ok=True)
-                date_string = datetime.now().strftime("%Y_%m%d_%H%M%S")
-                backup_filename = f"IA_BLE_Tracking_{date_string}.geojson"
-                backup_path = os.path.join(BACKUP_LOC, backup_filename)
-                shutil.copy2(TRACKING_FILE, backup_path)
-
-                # Overwrite the served GeoJSON
-                shutil.copy2(temp_geojson_path, TRACKING_FILE)
-
-                # Attributes for the response
-                df = gdf.drop(columns='geometry')
-
-                # Copy CSV to temp then overwrite production csv
-                save_dir, attributes_filename = os.path.split(TRACKING_FILE)
-                attributes_filename, ext = os.path.splitext(attributes_filename)
-                attributes_filename = attributes_filename + "_attributes.csv"
-                temp_path = os.path.join(temp_dir, attributes_filename)
-                df.to_csv(temp_path, index=False)
-
-                shutil.copy2(temp_path, os.path.join(save_dir, attributes_filename))
-
-                # *** EMIT SOCKET UPDATE HERE ***
-                # Here you emit an event signaling that the data has been updated
-                # You can send along any relevant data. For example, you might send:
-                # - A message that data is updated
-                # - The URL/path to the new GeoJSON so the client can fetch it
-                # emit('data_updated', {
-                #     'message': 'Tracking attributes updated successfully',
-                #     'csv_url': '/served/spatial/IA_BLE_Tracking_attributes.csv',  # Adjust this URL to how you serve the file
-                #     'timestamp': date_string
-                # }, broadcast=True)
-
-                return jsonify({'success': True, 'message': 'GeoJSON updated successfully'})
-            else:
-                return jsonify({'success': False, 'message': 'No .shp file found among uploaded files'}), 400
-        except Exception as e:
-            logging.error(f"Error processing uploaded files: {e}")
-            return jsonify({'success': False, 'message': f'Error processing files: {str(e)}'}), 500
+
+def run_upload_job(parts, mode, progress):
+    payload, status = process_tracking_upload(parts, progress, mode)
+    if status >= 400:
+        raise UploadRejected(payload)
+    return payload
+
+
+def job_response(job, status=200):
+    """Job record for clients: no server paths, plus the URLs to poll and download."""
+    public = {k: v for k, v in job.items() if k != "pid"}
+    if isinstance(job.get("result"), dict):
+        public["result"] = {k: v for k, v in job["result"].items() if k != "path"}
+    public["status_url"] = url_for("job_status", job_id=job["id"])
+    if job["status"] == "done":
+        public["result_url"] = url_for("job_result", job_id=job["id"])
+    return jsonify(public), status
+
+
+@app.route('/jobs/<kind>', methods=['POST'])
+def submit_job(kind):
+    if kind in EXPORT_JOBS:
+        name, build = EXPORT_JOBS[kind]
+        return job_response(JOB_MANAGER.submit(kind, run_export_job, name, build), 202)
+
+    if kind == "update-tracking-geojson":
+        # The request's streams close with the request, so the job gets the files read into memory
+        parts, error = read_request_upload()
+        if error:
+            return error
+        mode = request.values.get('mode', 'replace')
+        return job_response(JOB_MANAGER.submit(kind, run_upload_job, parts, mode), 202)
+
+    return jsonify({'error': f'Unknown job type: {kind}'}), 404
+
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify([{k: v for k, v in job.items() if k not in ("pid", "result")} for job in JOB_MANAGER.list()])
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = JOB_MANAGER.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return job_response(job)
+
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = JOB_MANAGER.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job["status"] != "done":
+        return job_response(job, 409)
+
+    result = job["result"] or {}
+    if "path" in result:
+        if not os.path.exists(result["path"]):
+            return jsonify({'error': 'Result expired, submit the job again'}), 410
+        return send_file(result["path"], as_attachment=True, download_name=result["download_name"])
+    return jsonify(result)
 
 
 @app.route('/static/<path:path>')
 def send_static(path):
-    return send_from_directory('static', path)
+    response = send_precompressed(os.path.join(app.root_path, 'static'), path)
+    if response is None:
+        return jsonify({"error": "File not found"}), 404
+    return response
+
+
+def warm_caches():
+    """
+    Load the metadata, the tracking table, its JSON and search index up front. Called by wsgi.py
+    in the server's master process, so forked workers start warm and share these pages.
+    Failures are only logged (e.g. no tracking data published yet): the server still starts,
+    and each cache fills on its first request instead.
+    """
+    start = time.perf_counter()
+    try:
+        METADATA_REGISTRY.get(TABLE_METADATA)
+        PAYLOAD_CACHE.get(("metadata-columns", "geojson"), [TABLE_METADATA],
+                          lambda: build_metadata_columns("geojson"))
+        entry = TRACKING_CACHE.get()
+        if entry.json_bytes is None:
+            entry.store_json(b"".join(iter_json_records(entry.frame, backend=JSON_ENCODER)))
+        entry.derived("table_index", TableIndex)
+    except Exception:
+        logging.exception("Could not warm the caches; they will be filled on first use")
+        return
+    logging.info(f"Warmed caches ({len(entry.frame)} tracking rows) in {time.perf_counter() - start:.2f}s")
 
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    # Development server; production runs wsgi.py under gunicorn (see gunicorn.conf.py)
+    app.run(debug=DEBUG_MODE)
@@ -0,0 +1,188 @@
+"""
+Async entry point: uvicorn asgi:app --workers 4 --port 8000
+(install requirements-asgi.txt; the gunicorn deployment does not need these packages)
+
+The read-only routes (table JSON, metadata, sources, served data and static files) and
+the /events streams are served natively on the event loop: cached payloads are answered
+without a thread, file bodies are streamed with non-blocking reads, and anything
+CPU-bound or blocking (loading the table, encoding and compressing its JSON, hashing a
+file for its ETag, reading change records) runs in the thread pool. Every other route
+(uploads, exports, jobs, backups) is passed through to the Flask app unchanged.
+"""
+import asyncio
+import contextlib
+import gzip
+import mimetypes
+import os
+import time
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.http import parse_accept_header
+from werkzeug.utils import safe_join
+
+from app import (app as flask_app, TRACKING_CACHE, PAYLOAD_CACHE, SERVED_VALIDATORS, TABLE_METADATA,
+                 SOURCES_FILE, CHANGE_FEED, JSON_ENCODER, build_metadata_columns, warm_caches)
+from py.events import format_sse, resume_version
+from py.http_cache import Payload, headers_not_modified, validator_headers
+from py.json_stream import iter_json_records
+from py.precompress import MIN_SIZE, pick_precompressed
+
+DATA_DIR = os.path.join(flask_app.root_path, "data")
+STATIC_DIR = os.path.join(flask_app.root_path, "static")
+
+
+def payload_response(request, payload: Payload, media_type="application/json") -> Response:
+    """The body, or a 304 if the client already has it; same validators as the Flask routes."""
+    headers = validator_headers(payload.etag, payload.last_modified)
+    if headers_not_modified(request.method, request.headers, payload.etag, payload.last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(payload.body, media_type=media_type, headers=headers)
+
+
+async def cached_payload(key, sources, build) -> Payload:
+    # Only a miss builds, in the thread pool; a hit only stats the sources
+    payload = PAYLOAD_CACHE.peek(key, sources)
+    if payload is None:
+        payload = await run_in_threadpool(PAYLOAD_CACHE.get, key, sources, build)
+    return payload
+
+
+async def table_json(request):
+    try:
+        entry = TRACKING_CACHE.peek() or await run_in_threadpool(TRACKING_CACHE.get)
+        if entry.json_bytes is None:
+            body = await run_in_threadpool(
+                lambda: b"".join(iter_json_records(entry.frame, backend=JSON_ENCODER)))
+            entry.store_json(body)
+        payload = Payload(entry.json_bytes, entry.etag, entry.last_modified)
+        accept_encodings = parse_accept_header(request.headers.get("Accept-Encoding"))
+        if len(payload.body) < MIN_SIZE or not accept_encodings["gzip"]:
+            response = payload_response(request, payload)
+        else:
+            # Compressed once per table version in the thread pool, not per response on the event loop
+            body = entry.peek_derived("json_gzip") or await run_in_threadpool(
+                entry.derived, "json_gzip", lambda frame: gzip.compress(payload.body, compresslevel=6, mtime=0))
+            response = payload_response(request, Payload(body, payload.etag, payload.last_modified))
+            if response.status_code == 200:
+                response.headers["Content-Encoding"] = "gzip"
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+async def metadata_columns(request):
+    requested_format = request.query_params.get('source_file_format', 'geojson')
+    payload = await cached_payload(("metadata-columns", requested_format), [TABLE_METADATA],
+                                   lambda: build_metadata_columns(requested_format))
+    return payload_response(request, payload)
+
+
+async def sources_metadata(request):
+    if not os.path.exists(SOURCES_FILE):
+        return JSONResponse({"error": "Sources file not found"}, status_code=404)
+
+    def build_sources():
+        with open(SOURCES_FILE, "rb") as f:
+            return f.read()
+
+    return payload_response(request, await cached_payload("api-sources", [SOURCES_FILE], build_sources))
+
+
+async def mapbox_token(request):
+    return JSONResponse({"MAPBOX_TOKEN": os.getenv("MAPBOX_TOKEN")})
+
+
+async def send_precompressed(request, directory, filename):
+    """Async counterpart of app.send_precompressed: best accepted .br/.gz sibling, with validators."""
+    file_path = safe_join(directory, filename)
+    if file_path is None or not os.path.isfile(file_path):
+        return JSONResponse({"error": "File not found"}, status_code=404)
+
+    accept_encodings = parse_accept_header(request.headers.get("Accept-Encoding"))
+    served_path, encoding = pick_precompressed(file_path, accept_encodings)
+    validators = SERVED_VALIDATORS.peek(served_path)
+    if validators is None:
+        validators = await run_in_threadpool(SERVED_VALIDATORS.get, served_path)
+    etag, last_modified = validators
+
+    headers = validator_headers(etag, last_modified)
+    headers["Vary"] = "Accept-Encoding"
+    if headers_not_modified(request.method, request.headers, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    media_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+    return FileResponse(served_path, media_type=media_type, headers=headers)
+
+
+async def serve_data(request):
+    # Read before the file is opened, as in app.serve_data
+    version = CHANGE_FEED.version()
+    response = await send_precompressed(request, DATA_DIR, request.path_params["filename"])
+    if response.status_code != 404:
+        response.headers["X-Data-Version"] = str(version)
+    return response
+
+
+async def send_static(request):
+    return await send_precompressed(request, STATIC_DIR, request.path_params["path"])
+
+
+async def data_events(request, poll_interval=1.0, keepalive=15.0):
+    """Async counterpart of app.data_events: any number of open streams, none holding a thread."""
+    last_version = resume_version(request.headers.get("Last-Event-ID"), request.query_params.get("since"))
+
+    async def generate():
+        version = CHANGE_FEED.version() if last_version is None else last_version
+        last_sent = time.monotonic()
+        yield format_sse(None, retry=int(poll_interval * 3000))
+        while not await request.is_disconnected():
+            # Checking for a new version is a stat; only a new version reads its change records,
+            # in the thread pool
+            events = []
+            if CHANGE_FEED.version() != version:
+                events = await run_in_threadpool(CHANGE_FEED.events_since, version)
+            for event in events:
+                version = event["version"]
+                last_sent = time.monotonic()
+                yield format_sse(event)
+            if time.monotonic() - last_sent > keepalive:
+                last_sent = time.monotonic()
+                yield b": keep-alive\n\n"
+            await asyncio.sleep(poll_interval)
+
+    return StreamingResponse(generate(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # Each uvicorn worker is its own process, so each warms its own caches
+    await run_in_threadpool(warm_caches)
+    yield
+
+
+# Small payloads built in memory are compressed per response, like Flask-Compress does for the Flask
+# routes; the table JSON keeps a compressed copy per version and files have precompressed siblings
+compress = [Middleware(GZipMiddleware, minimum_size=MIN_SIZE)]
+
+app = Starlette(
+    routes=[
+        Route("/events", data_events),
+        Route("/data-table.json", table_json),
+        Route("/metadata-columns", metadata_columns, middleware=compress),
+        Route("/api/sources", sources_metadata, middleware=compress),
+        Route("/mapbox-token/", mapbox_token),
+        Route("/served/{filename:path}", serve_data),
+        Route("/static/{path:path}", send_static),
+        Mount("/", app=WSGIMiddleware(flask_app)),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,42 @@
+# Gunicorn settings for the production server (startup.txt): gunicorn --config gunicorn.conf.py wsgi:app
+# Every setting can be overridden with an environment variable, e.g. WEB_CONCURRENCY=2.
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+# Worker processes, each serving requests on a few threads (requests mostly wait on I/O or numpy)
+workers = int(os.getenv("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2 + 1, 8)))
+worker_class = "gthread"
+# Each open /events stream holds a thread for up to EVENT_STREAM_SECONDS, so every worker gets
+# a thread per stream slot (EVENT_STREAMS in app.py) on top of the ones serving requests
+threads = int(os.getenv("GUNICORN_THREADS", 4)) + int(os.getenv("EVENT_STREAMS", 2))
+
+# Import the app (and warm its caches) once in the master, then fork the workers.
+# A HUP restarts the workers gracefully with the loaded code; deploy new code with a full restart.
+preload_app = True
+
+# Uploads and exports run as background jobs, so requests should finish well within this
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+# Seconds workers get to finish in-flight requests on a restart (HUP) or shutdown
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+
+# Recycle workers now and then; the jitter keeps them from restarting at the same time.
+# Uploads and exports run on threads in the worker that took the request (app.JOB_MANAGER),
+# so pre_request below holds off the recycle while that worker still has jobs to finish.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 200))
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def pre_request(worker, req):
+    # The request about to be counted would recycle the worker; with jobs running, allow a few more
+    # and check again then. Shutdowns and restarts (TERM, HUP) still stop the worker as usual.
+    if worker.nr + 1 >= worker.max_requests:
+        from app import JOB_MANAGER
+        if JOB_MANAGER.active():
+            worker.max_requests = worker.nr + 100
@@ -0,0 +1,98 @@
+import glob
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from py.publish import FileLock
+
+
+class ArtifactCache:
+    """
+    Files derived from the tracking data (e.g. Excel exports), built once per data version.
+
+    Each artifact is stored as <stem>.<version key><ext>, so a file that exists is always
+    complete for its version: builds write to a temporary path and are renamed into place.
+    Concurrent requests for an artifact that is still building, in this or another worker
+    process, wait on the same build (a file lock) instead of starting their own.
+    """
+
+    def __init__(self, root, keep=2, build_timeout=600.0):
+        """
+        :param root: Folder the artifacts are written to
+        :param keep: Versions of each artifact kept on disk, newest first
+        :param build_timeout: Seconds to wait for a build running elsewhere
+        """
+        self.root = root
+        self.keep = keep
+        self.build_timeout = build_timeout
+        self.hits = 0
+        self.builds = 0
+        self.waits = 0
+
+    @staticmethod
+    def version_key(version) -> str:
+        """Short stable key for a hashable data version (e.g. TrackingDataCache.data_version())."""
+        return hashlib.blake2b(repr(version).encode("utf-8"), digest_size=8).hexdigest()
+
+    def path_for(self, name, key) -> str:
+        stem, ext = os.path.splitext(name)
+        return os.path.join(self.root, f"{stem}.{key}{ext}")
+
+    def get(self, name, version, build) -> str:
+        """
+        Return the path of an artifact for a data version, building it if needed.
+        :param name: Artifact file name, e.g. 'IA_BLE_Tracking.xlsx'
+        :param version: Hashable data version the artifact is derived from; must be the same in
+            every process for the same data (e.g. file signatures, not in-process counters)
+        :param build: Callable writing the artifact to the path it is given
+        """
+        path = self.path_for(name, self.version_key(version))
+        if os.path.exists(path):
+            self.hits += 1
+            return path
+
+        os.makedirs(self.root, exist_ok=True)
+        with FileLock(f"{path}.lock", timeout=self.build_timeout):
+            # Another request or worker may have finished the build while this one waited
+            if os.path.exists(path):
+                self.waits += 1
+                return path
+
+            stem, ext = os.path.splitext(path)
+            temp_path = f"{stem}.tmp{os.getpid()}_{threading.get_ident()}{ext}"
+            start = time.perf_counter()
+            try:
+                build(temp_path)
+                os.replace(temp_path, path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            self.builds += 1
+            logging.info(f"Built {os.path.basename(path)} in {time.perf_counter() - start:.2f}s")
+
+        self._prune(name)
+        return path
+
+    def _prune(self, name):
+        """Remove all but the newest versions of an artifact."""
+        stem, ext = os.path.splitext(name)
+        versions = [p for p in glob.glob(os.path.join(glob.escape(self.root), f"{glob.escape(stem)}.*{ext}"))
+                    if ".tmp" not in os.path.basename(p)]
+        # Another worker may be pruning too; files that vanish are skipped
+        mtimes = {}
+        for version_path in versions:
+            try:
+                mtimes[version_path] = os.path.getmtime(version_path)
+            except OSError:
+                continue
+        for old_path in sorted(mtimes, key=mtimes.get, reverse=True)[self.keep:]:
+            for stale in (old_path, f"{old_path}.lock"):
+                try:
+                    os.remove(stale)
+                except OSError as e:  # Still open for download (Windows) or already removed
+                    logging.debug(f"Could not remove {stale}: {e}")
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "builds": self.builds, "waits": self.waits}
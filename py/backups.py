@@ -0,0 +1,199 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime
+
+LEGACY_BACKUP = re.compile(r"^(?P<name>.+)_(?P<stamp>\d{4}_\d{4}_\d{6})(?P<ext>\.[^.]+)$")
+
+
+def file_digest(path, chunk_size=1024 * 1024) -> str:
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BackupStore:
+    """
+    Content-addressed snapshots of the published data files.
+
+    Each distinct file content is stored once, gzip-compressed, as objects/<hash[:2]>/<hash>.gz;
+    index.json lists the snapshots (name, hash, time, data version) that point at them. Taking a
+    snapshot of content that is already stored only adds an index entry, and an already
+    gzip-compressed copy of the file (e.g. its precompressed .gz sibling) is linked instead of
+    compressed again. Retention keeps the newest snapshots plus one per day for a while;
+    objects no snapshot points at are removed.
+    """
+
+    def __init__(self, root, keep_last=20, keep_daily_days=90):
+        """
+        :param root: Backup folder (data/_backups)
+        :param keep_last: Newest snapshots always kept, per file name
+        :param keep_daily_days: Days for which the last snapshot of each day is kept
+        """
+        self.root = root
+        self.object_dir = os.path.join(root, "objects")
+        self.index_file = os.path.join(root, "index.json")
+        self.keep_last = keep_last
+        self.keep_daily_days = keep_daily_days
+        self._lock = threading.Lock()
+
+    def _object_path(self, digest) -> str:
+        return os.path.join(self.object_dir, digest[:2], f"{digest}.gz")
+
+    def _read_index(self) -> list:
+        try:
+            with open(self.index_file, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def _write_index(self, entries):
+        os.makedirs(self.root, exist_ok=True)
+        temp_path = f"{self.index_file}.tmp{os.getpid()}"
+        with open(temp_path, "w") as f:
+            json.dump(entries, f, indent=2)
+        os.replace(temp_path, self.index_file)
+
+    def _store_object(self, path, digest, compressed=None) -> int:
+        """Store the file's content under its digest unless it is already there. Returns the object size."""
+        object_path = self._object_path(digest)
+        if os.path.exists(object_path):
+            return os.path.getsize(object_path)
+
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        temp_path = f"{object_path}.tmp{os.getpid()}"
+        if compressed and os.path.exists(compressed):
+            try:
+                os.link(compressed, temp_path)
+            except OSError:  # Other file system, or links not supported
+                shutil.copyfile(compressed, temp_path)
+        else:
+            with open(path, "rb") as src, gzip.GzipFile(temp_path, "wb", compresslevel=6, mtime=0) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.replace(temp_path, object_path)
+        return os.path.getsize(object_path)
+
+    def snapshot(self, path, name=None, data_version=None, note=None, compressed=None, created=None) -> dict:
+        """
+        Record the current content of a file.
+        :param path: File to back up
+        :param name: Name the snapshot is listed under (defaults to the file name)
+        :param data_version: Data version the content belongs to
+        :param note: Free text, e.g. 'before upload'
+        :param compressed: Existing gzip of the same content to reuse (the precompressed sibling)
+        :param created: Snapshot time, defaults to now
+        :return: the snapshot entry; the latest entry if its content is identical
+        """
+        name = name or os.path.basename(path)
+        digest = file_digest(path)
+        with self._lock:
+            entries = self._read_index()
+            latest = next((e for e in reversed(entries) if e["name"] == name), None)
+            if latest is not None and latest["hash"] == digest:
+                return latest
+
+            stored_size = self._store_object(path, digest, compressed)
+            created = created or time.time()
+            entry = {
+                "id": f"{datetime.fromtimestamp(created).strftime('%Y%m%d%H%M%S')}-{digest[:8]}",
+                "name": name,
+                "hash": digest,
+                "created": created,
+                "size": os.path.getsize(path),
+                "stored_size": stored_size,
+                "data_version": data_version,
+                "note": note,
+            }
+            entries.append(entry)
+            entries.sort(key=lambda e: e["created"])
+            entries = self._apply_retention(entries)
+            self._write_index(entries)
+        logging.info(f"Backed up {name} as {entry['id']} ({stored_size / 1e6:.2f} MB stored)")
+        return entry
+
+    def _apply_retention(self, entries) -> list:
+        """Keep the newest snapshots of each name plus the last one of each recent day, then drop orphans."""
+        now = time.time()
+        kept = []
+        by_name = {}
+        for entry in entries:
+            by_name.setdefault(entry["name"], []).append(entry)
+        for name_entries in by_name.values():
+            newest = name_entries[-self.keep_last:] if self.keep_last else []
+            daily = {}
+            for entry in name_entries:
+                if now - entry["created"] <= self.keep_daily_days * 86400:
+                    daily[datetime.fromtimestamp(entry["created"]).date()] = entry
+            keep_ids = {e["id"] for e in newest} | {e["id"] for e in daily.values()}
+            kept.extend(e for e in name_entries if e["id"] in keep_ids)
+        kept.sort(key=lambda e: e["created"])
+
+        referenced = {e["hash"] for e in kept}
+        for entry in entries:
+            if entry["hash"] not in referenced and os.path.exists(self._object_path(entry["hash"])):
+                os.remove(self._object_path(entry["hash"]))
+                referenced.add(entry["hash"])  # Removed once
+        return kept
+
+    def list(self, name=None) -> list:
+        """Snapshots, newest first."""
+        entries = [e for e in self._read_index() if name is None or e["name"] == name]
+        return list(reversed(entries))
+
+    def get(self, snapshot_id):
+        return next((e for e in self._read_index() if e["id"] == snapshot_id), None)
+
+    def read(self, snapshot_id) -> bytes:
+        """A snapshot's content, decompressed in memory."""
+        entry = self.get(snapshot_id)
+        if entry is None:
+            raise KeyError(f"No backup {snapshot_id}")
+        with gzip.open(self._object_path(entry["hash"]), "rb") as f:
+            return f.read()
+
+    def restore_to(self, snapshot_id, out_path) -> dict:
+        """Write a snapshot's content to out_path (e.g. a publication staging path)."""
+        entry = self.get(snapshot_id)
+        if entry is None:
+            raise KeyError(f"No backup {snapshot_id}")
+        with gzip.open(self._object_path(entry["hash"]), "rb") as src, open(out_path, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        return entry
+
+    def import_legacy(self, remove=True) -> int:
+        """Move full-copy backups (<name>_<YYYY_mmdd_HHMMSS>.<ext>) from the backup folder into the store."""
+        if not os.path.isdir(self.root):
+            return 0
+        legacy = []
+        for filename in os.listdir(self.root):
+            match = LEGACY_BACKUP.match(filename)
+            if match:
+                created = datetime.strptime(match["stamp"], "%Y_%m%d_%H%M%S").timestamp()
+                legacy.append((created, filename, match["name"] + match["ext"]))
+        for created, filename, name in sorted(legacy):
+            path = os.path.join(self.root, filename)
+            self.snapshot(path, name=name, note="imported", created=created)
+            if remove:
+                os.remove(path)
+        return len(legacy)
+
+    def stats(self) -> dict:
+        entries = self._read_index()
+        objects = {e["hash"]: e["stored_size"] for e in entries}
+        return {"snapshots": len(entries), "objects": len(objects),
+                "stored_bytes": sum(objects.values()), "logical_bytes": sum(e["size"] for e in entries)}
+
+
+if __name__ == "__main__":
+    store = BackupStore(sys.argv[1] if len(sys.argv) > 1 else "../data/_backups")
+    print(f"Imported {store.import_legacy()} legacy backups")
+    print(store.stats())
@@ -0,0 +1,51 @@
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from read_write_df import StatusTableManager, df_to_excel_for_export
+
+SEED_TABLE = "../data/spatial/IA_BLE_Tracking_attributes.csv"
+TABLE_METADATA = "../data/IA_BLE_Tracking_metadata.json"
+ROW_COUNTS = [1_000, 10_000, 100_000]
+
+
+def build_frame(n_rows: int) -> pd.DataFrame:
+    """Tile the tracking attributes up to n_rows, typed for Excel the way /export-excel does."""
+    seed = pd.read_csv(SEED_TABLE, dtype=str)
+    reps = -(-n_rows // len(seed))
+    df = pd.concat([seed] * reps, ignore_index=True).iloc[:n_rows]
+    with StatusTableManager(TABLE_METADATA) as manager:
+        df = manager.rename_columns(df, "excel", "geojson")
+        df = manager.enforce_types(df, "excel")
+    return df
+
+
+def merged_headers_for(df: pd.DataFrame) -> list:
+    return [
+        {'text': 'Delivery Area Info', 'colspan': 3},
+        {'text': 'MIP Task Status', 'colspan': 3},
+        {'text': 'Model Manager Uploads', 'colspan': 5},
+        {'text': 'Details', 'colspan': len(df.columns) - 11},
+    ]
+
+
+def benchmark(row_counts=None):
+    """Time df_to_excel_for_export at each row count and print rows/sec and file size."""
+    row_counts = row_counts or ROW_COUNTS
+    print(f"{'rows':>8} {'seconds':>9} {'rows/sec':>10} {'MB':>7}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for n_rows in row_counts:
+            df = build_frame(n_rows)
+            start = time.perf_counter()
+            df_to_excel_for_export(df, temp_dir, f"bench_{n_rows}", sheetname="Tracking_Main",
+                                   merged_headers=merged_headers_for(df))
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(os.path.join(temp_dir, f"bench_{n_rows}.xlsx")) / 1e6
+            print(f"{n_rows:>8} {elapsed:>9.2f} {n_rows / elapsed:>10,.0f} {size:>7.1f}")
+
+
+if __name__ == "__main__":
+    benchmark([int(n) for n in sys.argv[1:]] or None)
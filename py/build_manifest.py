@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import time
+
+from backups import file_digest
+
+# Bump when a change to the build code should rebuild every target
+BUILD_VERSION = 1
+
+
+class BuildManifest:
+    """
+    Fingerprints of what each build target (a layer, or an output derived from layers)
+    was last built from and what it wrote, so a rebuild can skip targets that would
+    come out the same.
+
+    A file's fingerprint is its size, mtime and content hash. A file whose size and
+    mtime are unchanged is taken as unchanged without reading it; otherwise its hash
+    decides, so a copy or a touch with the same content does not trigger a rebuild.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.targets = {}
+        self._fingerprints = {}  # path -> fingerprint, computed once per run
+        if os.path.exists(path):
+            with open(path) as f:
+                manifest = json.load(f)
+            if manifest.get("build_version") == BUILD_VERSION:
+                self.targets = manifest.get("targets", {})
+
+    @staticmethod
+    def params_key(params) -> str:
+        return hashlib.blake2b(json.dumps(params, sort_keys=True, default=str).encode("utf-8"),
+                               digest_size=8).hexdigest()
+
+    def fingerprint(self, path, recorded=None):
+        """Fingerprint of a file, or None if it does not exist; only hashed when size or mtime differ."""
+        key = os.path.normpath(path)
+        if key in self._fingerprints:
+            return self._fingerprints[key]
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        if recorded and recorded["size"] == st.st_size and recorded["mtime_ns"] == st.st_mtime_ns:
+            digest = recorded["hash"]
+        else:
+            digest = file_digest(path)
+        fingerprint = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": digest}
+        self._fingerprints[key] = fingerprint
+        return fingerprint
+
+    @staticmethod
+    def _same(fingerprint, recorded) -> bool:
+        return fingerprint is not None and recorded is not None and fingerprint["hash"] == recorded["hash"]
+
+    def check(self, target, inputs=(), params=None):
+        """
+        Why the target needs a rebuild, or None if it is up to date.
+        :param inputs: files the target is built from
+        :param params: settings the build depends on (compared by hash)
+        """
+        entry = self.targets.get(target)
+        if entry is None:
+            return "not built before"
+        if entry["params"] != self.params_key(params):
+            return "settings changed"
+
+        recorded_inputs = entry["inputs"]
+        keys = [os.path.normpath(p) for p in inputs]
+        if set(keys) != set(recorded_inputs):
+            return "input files added or removed"
+        for key in keys:
+            if not self._same(self.fingerprint(key, recorded_inputs[key]), recorded_inputs[key]):
+                return f"{os.path.basename(key)} changed"
+
+        for key, recorded in entry["outputs"].items():
+            fingerprint = self.fingerprint(key, recorded)
+            if fingerprint is None:
+                return f"{os.path.basename(key)} missing"
+            if not self._same(fingerprint, recorded):
+                return f"{os.path.basename(key)} modified"
+        return None
+
+    def record(self, target, inputs=(), outputs=(), params=None, **extra):
+        """Record a successful build of the target; outputs are fingerprinted as just written."""
+        for path in outputs:
+            self._fingerprints.pop(os.path.normpath(path), None)
+        self.targets[target] = {
+            "params": self.params_key(params),
+            "inputs": {os.path.normpath(p): self.fingerprint(p) for p in inputs},
+            "outputs": {os.path.normpath(p): self.fingerprint(p) for p in outputs if os.path.exists(p)},
+            "built": time.time(),
+            **extra,
+        }
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = f"{self.path}.tmp{os.getpid()}"
+        with open(temp_path, "w") as f:
+            json.dump({"build_version": BUILD_VERSION, "targets": self.targets}, f, indent=2)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,177 @@
+import json
+import os
+import time
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+DEFAULT_KEYS = ["project_id", "HUC8"]
+AREA_COLUMN = "TO_Area"
+
+
+class ChangeSet:
+    """Rows inserted, updated and deleted between two versions of the tracking table."""
+
+    def __init__(self, keys, inserted, updated, deleted, changed_columns, affected_areas):
+        self.keys = keys
+        self.inserted = inserted  # key tuples
+        self.updated = updated  # {key tuple: [changed columns]}
+        self.deleted = deleted
+        self.changed_columns = changed_columns  # {column: rows changed}
+        self.affected_areas = affected_areas
+
+    @property
+    def empty(self) -> bool:
+        return not (self.inserted or self.updated or self.deleted)
+
+    def summary(self) -> dict:
+        return {"inserted": len(self.inserted), "updated": len(self.updated), "deleted": len(self.deleted),
+                "affected_areas": self.affected_areas}
+
+    def to_dict(self) -> dict:
+        def key_dict(key):
+            return dict(zip(self.keys, key))
+
+        return {
+            "keys": self.keys,
+            "inserted": [key_dict(k) for k in self.inserted],
+            "updated": [{**key_dict(k), "columns": cols} for k, cols in self.updated.items()],
+            "deleted": [key_dict(k) for k in self.deleted],
+            "changed_columns": self.changed_columns,
+            "affected_areas": self.affected_areas,
+        }
+
+
+def match_keys(current: pd.DataFrame, incoming: pd.DataFrame, candidates=None) -> list:
+    """
+    Shortest prefix of the candidate key columns that identifies rows in both frames,
+    e.g. project_id alone, or project_id + HUC8 where a project spans HUC8s.
+    """
+    candidates = [c for c in (candidates or DEFAULT_KEYS) if c in current.columns and c in incoming.columns]
+    if not candidates:
+        raise ValueError(f"No key columns ({', '.join(candidates or DEFAULT_KEYS)}) in both tables")
+    for n in range(1, len(candidates) + 1):
+        keys = candidates[:n]
+        if not current.duplicated(keys).any() and not incoming.duplicated(keys).any():
+            return keys
+    raise ValueError(f"Rows are not unique on {', '.join(candidates)}")
+
+
+def _keyed(df: pd.DataFrame, keys) -> pd.DataFrame:
+    keyed = df.copy()
+    keyed.index = pd.MultiIndex.from_frame(df[keys].astype("string").fillna(""))
+    return keyed
+
+
+def _comparable(values: pd.Series) -> pd.Series:
+    """Values as text with missing values as '', so typed and re-read values compare equal."""
+    return values.astype("string").fillna("").str.strip()
+
+
+def _geometry_changed(current: gpd.GeoSeries, incoming: gpd.GeoSeries, tolerance=1e-9) -> np.ndarray:
+    a = current.to_numpy()
+    b = incoming.to_numpy()
+    changed = ~shapely.equals_exact(a, b, tolerance=tolerance)
+    # Ring orientation or start vertex can differ between drivers; check those topologically
+    if changed.any():
+        idx = np.flatnonzero(changed)
+        changed[idx] = ~shapely.equals(a[idx], b[idx])
+    both_missing = shapely.is_missing(a) & shapely.is_missing(b)
+    return changed & ~both_missing
+
+
+def _area_values(df, keys_index) -> set:
+    if AREA_COLUMN not in df.columns or not len(keys_index):
+        return set()
+    return set(df.loc[keys_index, AREA_COLUMN].dropna().astype(str))
+
+
+def diff_frames(current: pd.DataFrame, incoming: pd.DataFrame, keys=None) -> ChangeSet:
+    """
+    Compare the incoming table against the current one, row by row on the key columns.
+    Only columns present in the incoming table are compared, so a partial upload does not
+    count the columns it leaves out as changes.
+    """
+    keys = keys or match_keys(current, incoming)
+    cur = _keyed(current, keys)
+    new = _keyed(incoming, keys)
+
+    inserted_index = new.index.difference(cur.index, sort=False)
+    deleted_index = cur.index.difference(new.index, sort=False)
+    common = new.index.intersection(cur.index, sort=False)
+    cur_common = cur.loc[common]
+    new_common = new.loc[common]
+
+    changed_rows = {}
+    changed_columns = {}
+    geometry_col = incoming.geometry.name if isinstance(incoming, gpd.GeoDataFrame) else None
+    for col in new.columns:
+        if col not in cur.columns or col in keys:
+            continue
+        if col == geometry_col:
+            diff = _geometry_changed(cur_common[col], new_common[col])
+        else:
+            diff = (_comparable(cur_common[col]) != _comparable(new_common[col])).to_numpy()
+        if diff.any():
+            changed_columns[col] = int(diff.sum())
+            for key in common[diff]:
+                changed_rows.setdefault(key, []).append(col)
+    for col in new.columns:
+        if col not in cur.columns:
+            # New column: every row with a value counts as updated
+            has_value = (_comparable(new_common[col]) != "").to_numpy()
+            if has_value.any():
+                changed_columns[col] = int(has_value.sum())
+                for key in common[has_value]:
+                    changed_rows.setdefault(key, []).append(col)
+
+    updated_index = pd.MultiIndex.from_tuples(list(changed_rows), names=common.names) if changed_rows else common[:0]
+    affected = (_area_values(cur, deleted_index) | _area_values(cur, updated_index)
+                | _area_values(new, updated_index) | _area_values(new, inserted_index))
+
+    return ChangeSet(keys=keys, inserted=list(inserted_index), updated=changed_rows,
+                     deleted=list(deleted_index), changed_columns=changed_columns,
+                     affected_areas=sorted(affected))
+
+
+def apply_changes(current: pd.DataFrame, incoming: pd.DataFrame, changes: ChangeSet) -> pd.DataFrame:
+    """
+    Current table with the change set applied: deleted rows dropped, updated rows
+    overwritten with the incoming values (columns the upload lacks are kept) and
+    inserted rows appended. Unchanged rows are left exactly as they are.
+    """
+    cur = _keyed(current, changes.keys)
+    new = _keyed(incoming, changes.keys)
+
+    updated = list(changes.updated)
+    replaced = cur.index.isin(updated + changes.deleted)
+    unchanged = cur[~replaced]
+
+    columns = list(cur.columns) + [c for c in new.columns if c not in cur.columns]
+    updated_rows = cur.loc[updated].reindex(columns=columns) if updated else cur.iloc[:0].reindex(columns=columns)
+    if updated:
+        new_cols = [c for c in new.columns]
+        updated_rows[new_cols] = new.loc[updated, new_cols]
+    inserted_rows = new.loc[changes.inserted].reindex(columns=columns)
+
+    parts = [p for p in (unchanged.reindex(columns=columns), updated_rows, inserted_rows) if len(p)]
+    merged = pd.concat(parts) if parts else unchanged.reindex(columns=columns)
+    merged = merged.reset_index(drop=True)
+    if isinstance(current, gpd.GeoDataFrame):
+        merged = gpd.GeoDataFrame(merged, geometry=current.geometry.name, crs=current.crs)
+    return merged
+
+
+def change_record_path(change_dir, version) -> str:
+    return os.path.join(change_dir, f"{int(version):06d}.json")
+
+
+def write_change_record(changes: ChangeSet, path, version, mode):
+    """Write the change set for a data version, for downstream consumers to redo only what changed."""
+    record = {"version": version, "mode": mode, "created": time.time(), **changes.to_dict()}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(record, f, indent=2, default=str)
+    return path
@@ -0,0 +1,148 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from py.delta import change_record_path
+from py.read_write_df import read_data_version
+
+EVENT_TYPE = "data-version"
+
+
+class ChangeFeed:
+    """
+    Data-version events for clients listening on a server-sent events stream.
+
+    Events are read from what every publication already writes: the version counter in
+    the marker file and the change record for that version. A stream in any worker
+    process therefore sees publications made by any other (or by the CLI scripts), and
+    a reconnecting client resumes from the last version it received.
+    """
+
+    def __init__(self, marker_file, change_dir, max_ids=500, max_backlog=50):
+        """
+        :param marker_file: data version marker (see read_write_df.update_last_modified)
+        :param change_dir: directory of the per-version change records
+        :param max_ids: above this many changed project_ids an event asks for a full reload
+        :param max_backlog: versions a reconnecting client may replay before it is told to reload
+        """
+        self.marker_file = marker_file
+        self.change_dir = change_dir
+        self.max_ids = max_ids
+        self.max_backlog = max_backlog
+        self._lock = threading.Lock()
+        self._signature = None
+        self._version = 0
+        self._changed = threading.Condition()
+
+    def _marker_signature(self):
+        try:
+            st = os.stat(self.marker_file)
+            return st.st_mtime_ns, st.st_size, st.st_ino
+        except FileNotFoundError:
+            return None
+
+    def version(self) -> int:
+        """Current data version; the marker is only re-read when its stat changes."""
+        signature = self._marker_signature()
+        with self._lock:
+            if signature != self._signature:
+                self._version = read_data_version(self.marker_file)
+                self._signature = signature
+            return self._version
+
+    def event(self, version) -> dict:
+        """The event for one version: its changed project_ids, or a reload if they are unknown or too many."""
+        try:
+            with open(change_record_path(self.change_dir, version)) as f:
+                record = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            # Published without a change record (e.g. by a CLI script)
+            return {"version": version, "reload": True}
+
+        def ids(rows):
+            return {str(row["project_id"]) for row in rows if row.get("project_id") is not None}
+
+        inserted, updated, deleted = ids(record["inserted"]), ids(record["updated"]), ids(record["deleted"])
+        project_ids = inserted | updated | deleted
+        event = {
+            "version": version,
+            "mode": record.get("mode"),
+            "created": record.get("created"),
+            "counts": {"inserted": len(record["inserted"]), "updated": len(record["updated"]),
+                       "deleted": len(record["deleted"])},
+            "changed_columns": sorted(record.get("changed_columns", {})),
+            "affected_areas": record.get("affected_areas", []),
+        }
+        if "project_id" not in record.get("keys", []) or len(project_ids) > self.max_ids:
+            return {**event, "reload": True}
+        return {**event, "reload": False, "project_ids": sorted(project_ids)}
+
+    def events_since(self, version) -> list:
+        """Events for every version after the given one, oldest first."""
+        current = self.version()
+        if version >= current:
+            if version > current:
+                # The marker went backwards (data restored by hand); start the client over
+                return [{"version": current, "reload": True}]
+            return []
+        if current - version > self.max_backlog:
+            return [{"version": current, "reload": True}]
+        return [self.event(v) for v in range(version + 1, current + 1)]
+
+    def notify(self):
+        """Wake the streams in this process now rather than at their next poll."""
+        with self._changed:
+            self._changed.notify_all()
+
+    def wait(self, timeout):
+        with self._changed:
+            self._changed.wait(timeout)
+
+    def stream(self, last_version=None, poll_interval=1.0, keepalive=15.0, max_seconds=None):
+        """
+        Yield a server-sent events stream: every new version as a data-version event,
+        with comment lines in between so proxies keep the connection open.
+        :param last_version: the version the client has (see resume_version); None to start from the current version
+        :param max_seconds: close the stream after this long (the browser reconnects and resumes)
+        """
+        start = last_sent = time.monotonic()
+        version = self.version() if last_version is None else last_version
+        yield format_sse(None, retry=int(poll_interval * 3000))
+        while max_seconds is None or time.monotonic() - start < max_seconds:
+            for event in self.events_since(version):
+                version = event["version"]
+                last_sent = time.monotonic()
+                yield format_sse(event)
+            if time.monotonic() - last_sent > keepalive:
+                last_sent = time.monotonic()
+                yield b": keep-alive\n\n"
+            self.wait(poll_interval)
+
+
+def parse_last_event_id(value):
+    """The version a client last received, from its Last-Event-ID header; None if absent or not a version."""
+    value = (value or "").strip()
+    return int(value) if value.isdigit() else None
+
+
+def resume_version(last_event_id, since=None):
+    """
+    The version a stream starts after: the Last-Event-ID of a reconnecting browser, else the
+    ?since= version the client loaded its data at (X-Data-Version), so nothing published
+    between that load and the first (or a refused) connection is missed; None for neither.
+    """
+    version = parse_last_event_id(last_event_id)
+    return parse_last_event_id(since) if version is None else version
+
+
+def format_sse(event, retry=None) -> bytes:
+    """One server-sent event; with no event, just the reconnect delay (or an empty comment)."""
+    lines = []
+    if retry is not None:
+        lines.append(f"retry: {retry}")
+    if event is not None:
+        lines += [f"id: {event['version']}", f"event: {EVENT_TYPE}", "data: " + json.dumps(event, default=str)]
+        logging.debug(f"Sending data version {event['version']} event")
+    return ("\n".join(lines) + "\n\n").encode("utf-8") if lines else b":\n\n"
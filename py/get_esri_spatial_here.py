@@ -1,48 +1,64 @@
+import copy
 import os
+import sys
+import time
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 import geopandas as gpd
 import json
+import numpy as np
 import pandas as pd
+import shapely
 import warnings
 import typing as T
-from shapely.geometry import Polygon, Point
-from shapely.lib import unary_union
-from shapely.ops import nearest_points
+from shapely.geometry import Polygon
 import pyproj
 import pyproj.aoi
 
-from read_write_df import df_to_excel, df_to_json, gdf_to_geojson
+from read_write_df import df_to_excel, df_to_json, df_to_feather, gdf_to_geojson
 from filter_sort_select import look_for_duplicates, filter_gdf_by_column, format_dates, reorder_gdf_columns
+from precompress import write_precompressed
+from build_manifest import BuildManifest
 
 
-def get_utm_zone(gdf):
-    # Get UTM area
+# Bounds are rounded out to this many degrees before the zone lookup, so nearly identical
+# extents share a cache entry
+UTM_BBOX_PRECISION = 0.01
+
+
+@lru_cache(maxsize=64)
+def get_transformer(from_crs, to_crs) -> pyproj.Transformer:
+    """Transformer between two CRSs (anything pyproj.CRS accepts), built once per pair."""
+    return pyproj.Transformer.from_crs(from_crs, to_crs, always_xy=True)
 
-    # Get input CRS and bounding box
-    input_crs = gdf.crs
-    bbox = gdf.total_bounds.tolist()
-    extent_gdf = bbox_to_gdf(bbox, input_crs)
 
-    east_lon_degree, north_lat_degree, south_lat_degree, west_lon_degree = bbox
-    aoi = pyproj.aoi.AreaOfInterest(east_lon_degree, north_lat_degree, south_lat_degree, west_lon_degree)
-    # print(f"  AOI: {aoi}")
+def get_utm_zone(gdf):
+    """EPSG code of the WGS 84 UTM zone covering most of the GeoDataFrame's extent."""
+    bbox = gdf.total_bounds
+    if not gdf.crs.is_geographic:
+        bbox = get_transformer(gdf.crs.srs, "EPSG:4326").transform_bounds(*bbox)
+    # Rounded outwards, so the rounded extent still covers the data
+    west, south = (np.floor(np.asarray(bbox[:2]) / UTM_BBOX_PRECISION) * UTM_BBOX_PRECISION).round(6)
+    east, north = (np.ceil(np.asarray(bbox[2:]) / UTM_BBOX_PRECISION) * UTM_BBOX_PRECISION).round(6)
+    return utm_zone_for_bounds(float(west), float(south), float(east), float(north))
+
+
+@lru_cache(maxsize=256)
+def utm_zone_for_bounds(west, south, east, north):
+    """EPSG code of the UTM zone with the largest share of a longitude/latitude box."""
+    aoi = pyproj.aoi.AreaOfInterest(west, south, east, north)
     utm_list = pyproj.database.query_utm_crs_info("WGS 84", aoi)
+    extent = shapely.box(west, south, east, north)
 
     areas_lookup = {}
     for utm in utm_list:
-        utm_crs = pyproj.CRS.from_epsg(utm.code)
-        utm_aoi = utm.area_of_use
-        aoi_bounds = utm_aoi.bounds
-        utm_gdf = bbox_to_gdf(aoi_bounds, input_crs)
-
-        # Get area of intersection
-        # extent_gdf_convert = extent_gdf.to_crs(epsg=utm.code)
-        intsct_area = extent_gdf.intersection(utm_gdf)
-        # Check if intersection is valid and not empty
-        if not intsct_area.is_empty.any():
-            # print(f"  Intsct Units: {intersect_units}")
-            total_area = intsct_area.geometry.to_crs(utm_crs).area.sum()
-            # print(f"  Intsct Area: {total_area}")
-            areas_lookup[utm.code] = total_area
+        # Get area of intersection, measured in the zone's own projection
+        intsct_area = extent.intersection(shapely.box(*utm.area_of_use.bounds))
+        if not intsct_area.is_empty:
+            transformer = get_transformer("EPSG:4326", f"EPSG:{utm.code}")
+            projected = shapely.transform(intsct_area, lambda xy: np.column_stack(
+                transformer.transform(xy[:, 0], xy[:, 1])))
+            areas_lookup[utm.code] = projected.area
 
     max_area = max(areas_lookup, key=areas_lookup.get)
     # print(f"  UTM Area: {max_area}")
@@ -75,62 +91,55 @@ def bbox_to_gdf(bbox_tuple, crs, name_str=None, outfolder=None) -> gpd.GeoDataFr
     return gdf
 
 
-def get_label_point(gdf, position=None, buffer_distance=None):
-    mipcase = gdf['MIP_Case'].iloc[0]
-    if not position:
-        position = "top_center"
-    if not buffer_distance:
-        buffer_distance = 0
+# Anchor of each label position on a bounding box, from arrays of (min_x, min_y, max_x, max_y)
+LABEL_POSITIONS = {
+    "bottom_left": lambda b: (b[:, 0], b[:, 1]),
+    "bottom_right": lambda b: (b[:, 2], b[:, 1]),
+    "top_left": lambda b: (b[:, 0], b[:, 3]),
+    "top_right": lambda b: (b[:, 2], b[:, 3]),
+    "top_center": lambda b: ((b[:, 0] + b[:, 2]) / 2, b[:, 3]),
+    "bottom_center": lambda b: ((b[:, 0] + b[:, 2]) / 2, b[:, 1]),
+    "left_center": lambda b: (b[:, 0], (b[:, 1] + b[:, 3]) / 2),
+    "right_center": lambda b: (b[:, 2], (b[:, 1] + b[:, 3]) / 2),
+}
+
 
+def label_points(gdf, position="top_right", buffer_distance=0, debug_folder=None) -> gpd.GeoSeries:
+    """
+    Label shapes for every row at once: the point of each row's convex hull (inset by
+    buffer_distance) nearest to the chosen corner or edge of the hull's bounds, buffered
+    by half the distance. The rows are projected to one UTM zone and back, once.
+    :param position: a LABEL_POSITIONS key
+    :param debug_folder: if given, the inset hulls are written there as a shapefile
+    :return: label geometries aligned with gdf, in its CRS
+    """
     input_crs = gdf.crs
     input_units = input_crs.axis_info[0].unit_name
     if input_crs.is_geographic or input_units != "metre":
         utm_crs = get_utm_zone(gdf)
         gdf = gdf.to_crs(epsg=utm_crs)
-        print(f'\t\t85 Converted CRS to {gdf.crs}')
-    else:
-        utm_crs = gdf.crs
-
-    # convex hull
-    ch = gdf.geometry.convex_hull
-    ch = ch.buffer(-1 * buffer_distance)
-    gdf_temp = gpd.GeoDataFrame(geometry=ch, crs=utm_crs)
-    outfile = f"./test/convex_hull_{mipcase}.shp"
-    os.makedirs(os.path.split(outfile)[0], exist_ok=True)
-    gdf_temp.to_file(outfile)
-
-    # Get the bounds of the convex hull
-    min_x, min_y, max_x, max_y = ch.total_bounds
-    print(f'\t\tBounds: {min_x, min_y, max_x, max_y}')
-
-    # Create points for each bounds location
-    positions = {"bottom_left": Point(min_x, min_y),
-                 "bottom_right": Point(max_x, min_y),
-                 "top_left": Point(min_x, max_y),
-                 "top_right": Point(max_x, max_y),
-                 "top_center": Point((max_x - min_x) / 2, max_y),
-                 "bottom_center": Point((max_x - min_x) / 2, min_y),
-                 "left_center": Point(min_x, (max_y - min_y) / 2),
-                 "right_center": Point(max_x, (max_y - min_y) / 2)}
-
-    # Initialize variables to track the closest point and minimum distance
-    input_point = positions[position]
-    pg_geo = unary_union(ch)
-    print(f'\t\tInput Point: {input_point},\n\t\tType: {type(input_point)}')
-    print(f'\t\tPG Geo: {pg_geo}')
-
-    # Find nearest point
-    nearest_point = nearest_points(input_point, pg_geo)[1].buffer(buffer_distance / 2).iloc[0]
-
-    print(f'\t\tNearest Point: {nearest_point},\n\t\tType: {type(nearest_point)}')
-
-    if utm_crs != input_crs:
-        pt_gdf = gpd.GeoDataFrame(geometry=[nearest_point], crs=utm_crs)
-        pt_gdf = pt_gdf.to_crs(input_crs)
-        nearest_point = pt_gdf.geometry.iloc[0]
-        print(f'\t\t91 Converted back to {pt_gdf.crs}')
-
-    return nearest_point
+        print(f'\t\tConverted CRS to {gdf.crs}')
+
+    hulls = shapely.convex_hull(gdf.geometry.to_numpy())
+    inset = shapely.buffer(hulls, -buffer_distance)
+    # Areas too small for the inset keep their whole hull
+    hulls = np.where(shapely.is_empty(inset), hulls, inset)
+    if debug_folder is not None:
+        os.makedirs(debug_folder, exist_ok=True)
+        gpd.GeoDataFrame(gdf.drop(columns=gdf.geometry.name), geometry=hulls, crs=gdf.crs).to_file(
+            os.path.join(debug_folder, "label_convex_hulls.shp"))
+
+    anchor_x, anchor_y = LABEL_POSITIONS[position](shapely.bounds(hulls))
+    # The far end of the shortest line from each anchor to its hull is the nearest hull point
+    nearest = shapely.get_point(shapely.shortest_line(shapely.points(anchor_x, anchor_y), hulls), 1)
+    labels = gpd.GeoSeries(shapely.buffer(nearest, buffer_distance / 2), index=gdf.index, crs=gdf.crs)
+    print(f'\t\tPlaced {len(labels)} labels at {position}')
+    return labels.to_crs(input_crs)
+
+
+def get_label_point(gdf, position=None, buffer_distance=None):
+    """Label shape for a single-row GeoDataFrame; see label_points."""
+    return label_points(gdf, position or "top_center", buffer_distance or 0).iloc[0]
 
 
 def read_json_to_dict(file: str) -> dict:
@@ -154,16 +163,74 @@ def get_centroids(gdf):
     return new_gdf
 
 
-def add_numbered_primary_key(gdf, col_name):
-    if col_name not in gdf.columns:
-        gdf[col_name] = range(1, len(gdf) + 1)
+def feature_keys(gdf, key_columns=None) -> np.ndarray:
+    """
+    A stable 64-bit key per row, from its key columns (default: its geometry, normalized).
+    Rows with the same key values are told apart by their order of occurrence.
+    """
+    if key_columns:
+        values = gdf[key_columns].reset_index(drop=True)
     else:
-        current_max_id = gdf[col_name].max(skipna=True)
-        new_id = current_max_id + 1 if not pd.isna(current_max_id) else 1
-        for idx, row in gdf.iterrows():
-            if pd.isna(row[col_name]):
-                gdf.at[idx, col_name] = new_id
-                new_id += 1
+        values = pd.DataFrame({"wkb": shapely.to_wkb(shapely.normalize(gdf.geometry.to_numpy()))})
+    keys = pd.Series(pd.util.hash_pandas_object(values, index=False).to_numpy())
+    occurrence = keys.groupby(keys).cumcount()
+    return pd.util.hash_pandas_object(pd.DataFrame({"key": keys, "n": occurrence}), index=False).to_numpy()
+
+
+def read_id_map(path) -> pd.Series:
+    """Ids by feature key, as written by write_id_map; empty if the map does not exist yet."""
+    if not path or not os.path.exists(path):
+        return pd.Series([], index=pd.Index([], dtype="uint64"), dtype="int64")
+    with open(path) as f:
+        id_map = json.load(f)
+    return pd.Series(id_map["ids"], index=pd.Index(np.array(id_map["keys"], dtype="uint64")), dtype="int64")
+
+
+def write_id_map(path, id_map: pd.Series):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.tmp{os.getpid()}"
+    with open(temp_path, "w") as f:
+        json.dump({"keys": id_map.index.tolist(), "ids": id_map.tolist()}, f)
+    os.replace(temp_path, path)
+
+
+def add_numbered_primary_key(gdf, col_name, id_map_path=None, key_columns=None):
+    """
+    Fill missing values of an integer key column. Existing ids are kept; missing ones get the
+    next block of ids after the highest in use, in row order.
+    :param id_map_path: optional JSON map of feature keys to ids (see feature_keys), so a feature
+        keeps its id when the layer is regenerated; ids of features that disappear are not reused
+    :param key_columns: columns identifying a feature for the id map, default its geometry
+    """
+    ids = gdf[col_name].to_numpy(dtype="float64", na_value=np.nan, copy=True) if col_name in gdf.columns \
+        else np.full(len(gdf), np.nan)
+
+    id_map = None
+    if id_map_path:
+        id_map = read_id_map(id_map_path)
+        keys = feature_keys(gdf, key_columns)
+        mapped = id_map.reindex(keys).to_numpy(dtype="float64", na_value=np.nan, copy=True)
+        # An explicit id in the source wins over a mapped one; those rows get new ids below
+        explicit_ids = ids[~np.isnan(ids)]
+        mapped[np.isin(mapped, explicit_ids)] = np.nan
+        ids = np.where(np.isnan(ids), mapped, ids)
+
+    missing = np.isnan(ids)
+    if missing.any():
+        highest = np.nanmax(ids) if not missing.all() else 0
+        if id_map is not None and len(id_map):
+            highest = max(highest, id_map.max())
+        ids[missing] = np.arange(highest + 1, highest + 1 + missing.sum())
+
+    # A float column (ids read alongside nulls) stays float, as the source had it
+    float_column = col_name in gdf.columns and gdf[col_name].dtype.kind == "f"
+    gdf[col_name] = ids if float_column else ids.astype("int64")
+
+    if id_map is not None:
+        # Features seen before keep their entries, so a feature that comes back gets its id back
+        current = pd.Series(ids.astype("int64"), index=pd.Index(keys, dtype="uint64"))
+        id_map = pd.concat([id_map[~id_map.index.isin(current.index)], current])
+        write_id_map(id_map_path, id_map)
     return gdf
 
 
@@ -215,6 +282,32 @@ SPECIAL_COLUMNS = {"FRP": 4}
 
 STATIC_DATA = ["Iowa_WhereISmodel", "US_states"]
 
+# Outputs built from other targets, in build order: what each is built from and its settings
+DERIVED_TARGETS = {
+    "Work_Areas": {"deps": ["IA_BLE_Tracking"],
+                   "params": {"buffer_distance": 250, "summary_column": ["TO_Area", "MIP_Case"]}},
+    "Work_Area_Labels": {"deps": ["Work_Areas"],
+                         "params": {"position": "top_right", "buffer_distance": 10000}},
+    "Centroids": {"deps": list(GROUP_LAYERS_LOOKUP), "params": GROUP_LAYERS_LOOKUP},
+}
+
+SHAPEFILE_PARTS = [".shp", ".dbf", ".shx", ".prj", ".cpg"]
+
+
+def layer_inputs(path) -> list:
+    """Files a layer is read from: the shapefile and its sidecar files."""
+    stem, ext = os.path.splitext(path)
+    if ext.lower() != ".shp":
+        return [path]
+    return [stem + part for part in SHAPEFILE_PARTS if os.path.exists(stem + part)]
+
+
+def layer_params(name) -> dict:
+    """Settings a layer's formatting depends on, so editing them rebuilds the layer."""
+    # Copied, as loading the layer renames the entries of its COLUMN_ORDERS list in place
+    return copy.deepcopy({"mapping": COLUMN_MAPPING.get(name), "order": COLUMN_ORDERS.get(name),
+            "special": SPECIAL_COLUMNS, "prod_status": PROD_STATUS_MAPPING})
+
 
 def aggregate_buffer_polygons(gdf, buffer_distance, summary_column: T.Union[str, list, None] = None):
     """
@@ -265,11 +358,176 @@ def aggregate_buffer_polygons(gdf, buffer_distance, summary_column: T.Union[str,
     return gdf
 
 
+# Reading a layer takes several times its shapefile size in memory
+LAYER_MEMORY_FACTOR = 8
+
+
+def format_layer(fname, path, id_map_path=None) -> dict:
+    """
+    Read one exported layer and format it: single-part, keyed, renamed, summarized,
+    date-formatted and in EPSG:4326. Runs in a worker process, so it only returns values.
+    :return: {"gdf", "crs" (as read), "columns", "column_order" (renamed COLUMN_ORDERS first list or None),
+              "timings" (seconds per step)}
+    """
+    timings = {}
+    step_start = time.perf_counter()
+
+    def lap(step):
+        nonlocal step_start
+        now = time.perf_counter()
+        timings[step] = now - step_start
+        step_start = now
+
+    base = os.path.dirname(path)
+    if ".gdb" in base:
+        # print(fiona.listlayers(gdb))
+        gdf = gpd.read_file(base, driver='FileGDB', layer=fname)
+    else:
+        gdf = gpd.read_file(path)
+        if "." in fname:
+            fname = fname.split(".")[0]
+    lap("read")
+
+    # Column Mapping
+    print(f'    {fname} Formatting...')
+    print(f"\tColumns: {gdf.columns}")
+    crs = gdf.crs
+    # Single-Part
+    gdf = gdf.explode(ignore_index=True)
+    name_cols = [c for c in gdf.columns if "name" in c.lower()]
+    print(f"     Name Columns: {name_cols}")
+    if len(name_cols) > 0:
+        for c in name_cols:
+            print(f"\t\t{c}")
+            uniques = sorted(gdf[c].unique())
+            duplicates = look_for_duplicates(gdf, c)
+            duplicate_names = duplicates[c].unique()
+            print(f"\t\tUnique Names: {uniques}")
+            print(f"\t\tDuplicate Names: {duplicate_names}")
+    # print(f"     Duplicates: {duplicates.drop(columns='geometry')}")
+    gdf = add_numbered_primary_key(gdf, 'loc_id', id_map_path)
+    lap("explode")
+
+    column_order = None
+    if fname in COLUMN_ORDERS:
+        gdf = reorder_gdf_columns(gdf, COLUMN_ORDERS[fname]["first"], COLUMN_ORDERS[fname]["last"])
+    if fname in COLUMN_MAPPING:
+        # print(f"\tColumns: {gdf.columns}")
+        cmapping = {k: v for k, v in COLUMN_MAPPING[fname].items() if v is not None and k in gdf.columns}
+        removals = [c for c in COLUMN_MAPPING[fname].keys() if
+                    COLUMN_MAPPING[fname][c] is None and c in gdf.columns]
+        print(f'     Column Removals: {removals}')
+        gdf.drop(columns=removals, inplace=True)
+        # print(f"\tColumns: {gdf.columns}")
+        gdf.rename(columns=cmapping, inplace=True)
+        # print(f"\tColumns: {gdf.columns}")
+
+        # Order list reflecting the new column names, merged into COLUMN_ORDERS by the caller
+        column_order = [COLUMN_MAPPING[fname][c] if c in COLUMN_MAPPING[fname] else c
+                        for c in COLUMN_ORDERS[fname]["first"]]
+        print(f'     New Column Order: {column_order}')
+
+    else:
+        print(f"     No column mapping for {fname}")
+    lap("rename")
+
+    # Summation columns
+    print(f"\tColumns: {gdf.columns}")
+    for c in gdf.columns:
+        if c in SPECIAL_COLUMNS:
+            print(f"     Summarizing {c}")
+            gdf = esri2geoJSON.add_summation_columns(gdf, c, SPECIAL_COLUMNS[c])
+    lap("summarize")
+
+    # Fix* times and dates
+    gdf = format_dates(gdf)
+    gdf = gdf.to_crs(epsg=4326)
+    lap("reproject")
+
+    # Store and print
+    columns = [c for c in gdf.columns.to_list()]
+    print(f'     {fname} Input Columns: {columns}, \n     CRS: {crs}')
+    return {"gdf": gdf, "crs": crs, "columns": columns, "column_order": column_order, "timings": timings}
+
+
+def layer_memory_estimate(path) -> int:
+    """Rough peak memory (bytes) of reading a layer, from its shapefile sizes on disk."""
+    stem = os.path.splitext(path)[0]
+    size = sum(os.path.getsize(stem + ext) for ext in (".shp", ".dbf") if os.path.exists(stem + ext))
+    return size * LAYER_MEMORY_FACTOR
+
+
+def available_memory() -> T.Optional[int]:
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):  # Not available on Windows
+        return None
+
+
+def load_layers(layers: dict, max_workers=None, memory_budget=None, id_map_folder=None) -> dict:
+    """
+    Format every layer (see format_layer) in a process pool, largest first. A layer only
+    starts while the estimated memory of the running layers fits the budget, so a few
+    large layers do not run the machine out of memory; one layer always runs.
+    :param layers: {layer name: path}
+    :param max_workers: processes, default the CPU count (1 reads the layers in this process)
+    :param memory_budget: bytes, default 3/4 of the currently available memory
+    :param id_map_folder: folder of the per-layer loc_id maps, so ids are stable across runs
+    :return: {layer name: format_layer result}, in the order of layers
+    """
+    start = time.perf_counter()
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(layers)))
+    if memory_budget is None:
+        available = available_memory()
+        memory_budget = available * 3 // 4 if available else float("inf")
+    estimates = {name: layer_memory_estimate(path) for name, path in layers.items()}
+    # Each layer has its own id map, so parallel workers never write the same file
+    id_maps = {name: os.path.join(id_map_folder, f"{name}_loc_ids.json") if id_map_folder else None
+               for name in layers}
+
+    results = {}
+    if max_workers == 1:
+        for name, path in layers.items():
+            results[name] = format_layer(name, path, id_maps[name])
+    else:
+        pending = sorted(layers, key=lambda name: -estimates[name])
+        running = {}  # future: layer name
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            while pending or running:
+                in_use = sum(estimates[name] for name in running.values())
+                for name in list(pending):
+                    if len(running) >= max_workers:
+                        break
+                    if running and in_use + estimates[name] > memory_budget:
+                        continue
+                    running[pool.submit(format_layer, name, layers[name], id_maps[name])] = name
+                    in_use += estimates[name]
+                    pending.remove(name)
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+
+    # Per-layer timings
+    wall = time.perf_counter() - start
+    print(f'\n   Loaded {len(layers)} layers in {wall:.2f}s ({max_workers} processes)')
+    for name in layers:
+        timings = results[name]["timings"]
+        steps = ", ".join(f"{step} {seconds:.2f}s" for step, seconds in timings.items())
+        print(f'     {name}: {sum(timings.values()):.2f}s ({steps})')
+    return {name: results[name] for name in layers}
+
+
 class esri2geoJSON:
-    def __init__(self):
+    def __init__(self, incremental=True, debug_folder=None):
+        """
+        :param incremental: skip the targets whose inputs did not change since the last build
+        :param debug_folder: where to write intermediate shapes (e.g. label hulls), off by default
+        """
         self.server_path = os.path.split(__file__)[0]
         self.esri_folder = "../data/esri_exports/"
         self.output_folder = "../data/spatial/"
+        self.id_map_folder = "../data/esri_exports/id_maps/"
+        self.debug_folder = debug_folder
 
         self.esri_files = {}
         self.gdf_dict = {}
@@ -286,6 +544,11 @@ class esri2geoJSON:
                     pass
                 else:
                     print(f' {v}: {getattr(self, v)}')
+
+        self.incremental = incremental
+        self.manifest = BuildManifest(self.output_folder + "build_manifest.json")
+        self.layer_params = {}
+        self.plan = {}  # target: reason to rebuild it, None to skip it
         self._init_gdf_from_fc()
 
     def _init_gdf_from_fc(self):
@@ -303,70 +566,65 @@ class esri2geoJSON:
                             print(f'\n   Name: {name} \n   Filename: {filename}')
                             self.esri_files[name] = entry.path
 
-        for fname, path, in self.esri_files.items():
-            if ".gdb" in base:
-                # print(fiona.listlayers(gdb))
-                gdf = gpd.read_file(base, driver='FileGDB', layer=fname)
-            else:
-                gdf = gpd.read_file(path)
-                if "." in fname:
-                    fname = fname.split(".")[0]
-
-            # Column Mapping
-            print(f'    {fname} Formatting...')
-            print(f"\tColumns: {gdf.columns}")
-            self.crs_dict[fname] = gdf.crs
-            # Single-Part
-            gdf = gdf.explode(ignore_index=True)
-            name_cols = [c for c in gdf.columns if "name" in c.lower()]
-            print(f"     Name Columns: {name_cols}")
-            if len(name_cols) > 0:
-                for c in name_cols:
-                    print(f"\t\t{c}")
-                    uniques = sorted(gdf[c].unique())
-                    duplicates = look_for_duplicates(gdf, c)
-                    duplicate_names = duplicates[c].unique()
-                    print(f"\t\tUnique Names: {uniques}")
-                    print(f"\t\tDuplicate Names: {duplicate_names}")
-            # print(f"     Duplicates: {duplicates.drop(columns='geometry')}")
-            gdf = add_numbered_primary_key(gdf, 'loc_id')
-            if fname in COLUMN_ORDERS:
-                gdf = reorder_gdf_columns(gdf, COLUMN_ORDERS[fname]["first"], COLUMN_ORDERS[fname]["last"])
-            if fname in COLUMN_MAPPING:
-                # print(f"\tColumns: {gdf.columns}")
-                cmapping = {k: v for k, v in COLUMN_MAPPING[fname].items() if v is not None and k in gdf.columns}
-                removals = [c for c in COLUMN_MAPPING[fname].keys() if
-                            COLUMN_MAPPING[fname][c] is None and c in gdf.columns]
-                print(f'     Column Removals: {removals}')
-                gdf.drop(columns=removals, inplace=True)
-                # print(f"\tColumns: {gdf.columns}")
-                gdf.rename(columns=cmapping, inplace=True)
-                # print(f"\tColumns: {gdf.columns}")
-
-                # Mod order list-dictionary to reflect new column names
-                for c in COLUMN_ORDERS[fname]["first"]:
-                    if c in COLUMN_MAPPING[fname]:
-                        COLUMN_ORDERS[fname]["first"][COLUMN_ORDERS[fname]["first"].index(c)] = COLUMN_MAPPING[fname][c]
-                print(f'     New Column Order Dict: {COLUMN_ORDERS[fname]}')
-
-            else:
-                print(f"     No column mapping for {fname}")
-
-            # Summation columns
-            print(f"\tColumns: {gdf.columns}")
-            for c in gdf.columns:
-                if c in SPECIAL_COLUMNS:
-                    print(f"     Summarizing {c}")
-                    gdf = self.add_summation_columns(gdf, c, SPECIAL_COLUMNS[c])
+        # Only read the layers that are rebuilt or that a rebuilt target is built from
+        self.plan = self.plan_build()
+        needed = self.layers_to_load()
+        layers = {name: path for name, path in self.esri_files.items() if name in needed}
 
-            # Fix* times and dates
-            gdf = format_dates(gdf)
-            gdf = gdf.to_crs(epsg=4326)
+        # Layers are independent, so they are read and formatted in parallel
+        for fname, layer in load_layers(layers, id_map_folder=self.id_map_folder).items():
+            self.crs_dict[fname] = layer["crs"]
+            self.c_lists[fname] = layer["columns"]
+            if layer["column_order"] is not None:
+                COLUMN_ORDERS[fname]["first"] = layer["column_order"]
+            self.gdf_dict[fname] = layer["gdf"]
 
-            # Store and print
-            self.c_lists[fname] = [c for c in gdf.columns.to_list()]
-            print(f'     {fname} Input Columns: {self.c_lists[fname]}, \n     CRS: {self.crs_dict[fname]}')
-            self.gdf_dict[fname] = gdf
+    def plan_build(self) -> dict:
+        """
+        Decide which targets to rebuild: layers whose shapefiles or settings changed, or whose
+        outputs are missing or were edited since the last build, and the targets built from them.
+        :return: {target: reason to rebuild, or None to skip}
+        """
+        plan = {}
+        for name, path in self.esri_files.items():
+            self.layer_params[name] = layer_params(name)
+            plan[name] = (self.manifest.check(name, layer_inputs(path), self.layer_params[name])
+                          if self.incremental else "full rebuild")
+        for name, target in DERIVED_TARGETS.items():
+            rebuilt = [dep for dep in target["deps"] if plan.get(dep)]
+            if not self.incremental:
+                plan[name] = "full rebuild"
+            elif rebuilt:
+                plan[name] = f"{', '.join(rebuilt)} rebuilt"
+            else:
+                plan[name] = self.manifest.check(name, params=target["params"])
+
+        # A derived target is built from the frames of its dependencies, so those are rebuilt too
+        for name in reversed(list(DERIVED_TARGETS)):
+            if plan[name]:
+                for dep in DERIVED_TARGETS[name]["deps"]:
+                    if dep in DERIVED_TARGETS and not plan[dep]:
+                        plan[dep] = f"needed by {name}"
+
+        print(f'\n   Build plan ({"incremental" if self.incremental else "full"}):')
+        for name, reason in plan.items():
+            print(f'     {"rebuild" if reason else "skip   "} {name}' + (f': {reason}' if reason else ''))
+        return plan
+
+    def layers_to_load(self) -> set:
+        """Layers being rebuilt, plus the layers a rebuilt derived target is built from."""
+        needed = {name for name in self.esri_files if self.plan.get(name)}
+        for name, target in DERIVED_TARGETS.items():
+            if self.plan.get(name):
+                needed.update(dep for dep in target["deps"] if dep in self.esri_files)
+        return needed
+
+    def record_target(self, name, outputs):
+        """Record a built target in the manifest with the files it was built from and wrote."""
+        if name in DERIVED_TARGETS:
+            self.manifest.record(name, outputs=outputs, params=DERIVED_TARGETS[name]["params"])
+        else:
+            self.manifest.record(name, layer_inputs(self.esri_files[name]), outputs, self.layer_params[name])
 
     @staticmethod
     def add_summation_columns(gdf, column, max_length):
@@ -411,6 +669,9 @@ class esri2geoJSON:
         return gdf
 
     def output_centroids(self):
+        if not self.plan.get("Centroids"):
+            print(f'\n   Centroids up to date, skipped')
+            return
         centroids = {}
         for name, gdf in self.gdf_dict.items():
             extent_gdf = bbox_to_gdf(gdf.total_bounds, gdf.crs, name)
@@ -431,6 +692,7 @@ class esri2geoJSON:
 
         with open(self.output_folder + "Centroids.json", 'w') as f:
             json.dump(centroids, f, indent=2)
+        self.record_target("Centroids", [self.output_folder + "Centroids.json"])
 
     def export_geojsons(self, *kwd_args):
         print(f'{self.gdf_dict.keys()}')
@@ -440,11 +702,16 @@ class esri2geoJSON:
 
         for name, gdf in self.gdf_dict.items():
             print(f"\n\nFound {name}")
+            outputs = [self.output_folder + f"{name}{ext}" for ext in [".geojson", ".json", "_attributes.arrow"]]
 
-            # Skip if static data and already exists
+            # Skip if unchanged since the last build, or static data that already exists
+            if not self.plan.get(name):
+                print(f"   Up to date, skipped")
+                continue
             if name in STATIC_DATA:
                 outpath = self.output_folder + f"{name}.geojson"
                 if os.path.exists(outpath):
+                    self.record_target(name, outputs)
                     continue
 
             # Create points
@@ -460,6 +727,9 @@ class esri2geoJSON:
             gdf_to_geojson(gdf, self.output_folder, name)
             df = gdf.drop(columns='geometry')
             df_to_json(df, self.output_folder, name)
+            df_to_feather(df, self.output_folder, f"{name}_attributes")
+            for outpath in outputs:
+                write_precompressed(outpath)
 
             # Export Excel
             if name == self.primary_spatial:
@@ -467,6 +737,8 @@ class esri2geoJSON:
                 excel_folder = os.path.dirname(os.path.dirname(self.output_folder)) + "/tables/"
                 os.makedirs(excel_folder, exist_ok=True)
                 df_to_excel(df, excel_folder, name, sheetname="Tracking_Main")
+                outputs.append(excel_folder + f"{name}.xlsx")
+            self.record_target(name, outputs)
 
         self.gdf_dict.update(new_gdf)
 
@@ -498,26 +770,31 @@ class esri2geoJSON:
     def update_iowa_status_map(self, summ_column, kwd_list):
         self.primary_spatial = "IA_BLE_Tracking"
         self.cname_to_summarize = summ_column
-        # if not os.path.exists(f"{self.output_folder}Work_Areas.geojson"):
-        work_areas_gdf = aggregate_buffer_polygons(self.gdf_dict["IA_BLE_Tracking"],
-                                                   250, ["TO_Area", "MIP_Case"])
-        self.gdf_dict["Work_Areas"] = work_areas_gdf
-
-        wa_label_points = []
-        for idx, row in work_areas_gdf.iterrows():
-            row_gdf = gpd.GeoDataFrame([row], crs=work_areas_gdf.crs)
-            point = get_label_point(row_gdf, "top_right", 10000)
-            wa_label_points.append({"MIP_Case": row.MIP_Case, "TO_Area": row.TO_Area, "geometry": point})
-        wa_label_gdf = gpd.GeoDataFrame(wa_label_points, geometry='geometry', crs=work_areas_gdf.crs)
-        self.gdf_dict["Work_Area_Labels"] = wa_label_gdf
+        # Derived targets are only rebuilt when the plan says so (see plan_build)
+        if self.plan.get("Work_Areas"):
+            params = DERIVED_TARGETS["Work_Areas"]["params"]
+            work_areas_gdf = aggregate_buffer_polygons(self.gdf_dict["IA_BLE_Tracking"],
+                                                       params["buffer_distance"], params["summary_column"])
+            self.gdf_dict["Work_Areas"] = work_areas_gdf
+
+        if self.plan.get("Work_Area_Labels"):
+            params = DERIVED_TARGETS["Work_Area_Labels"]["params"]
+            work_areas_gdf = self.gdf_dict["Work_Areas"]
+            labels = label_points(work_areas_gdf, params["position"], params["buffer_distance"], self.debug_folder)
+            wa_label_gdf = gpd.GeoDataFrame(work_areas_gdf[["MIP_Case", "TO_Area"]].reset_index(drop=True),
+                                            geometry=labels.to_numpy(), crs=work_areas_gdf.crs)
+            self.gdf_dict["Work_Area_Labels"] = wa_label_gdf
 
         self.export_geojsons(*kwd_list)
         self.output_centroids()
+        self.manifest.save()
 
 
 if __name__ == "__main__":
     cname = "Production"
     keywords = ["TODO", "UPDATE"]
-    to_gdf = esri2geoJSON()
+    # --full rebuilds every target regardless of the build manifest; --debug writes intermediate shapes
+    to_gdf = esri2geoJSON(incremental="--full" not in sys.argv,
+                          debug_folder="./test/" if "--debug" in sys.argv else None)
     to_gdf.update_iowa_status_map(cname, keywords)
     print("Done")
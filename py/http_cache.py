@@ -0,0 +1,165 @@
+import hashlib
+import os
+import threading
+from datetime import datetime, timezone
+
+from flask import Response, request
+from werkzeug.http import http_date, quote_etag
+from werkzeug.sansio.http import is_resource_modified
+
+
+def content_etag(data: bytes) -> str:
+    """Content hash used as the ETag for a response body."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def file_etag(path, chunk_size=1024 * 1024) -> str:
+    """Content hash of a file, read in chunks so large layers are not loaded at once."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def mtime_to_datetime(mtime_ns) -> datetime:
+    return datetime.fromtimestamp(mtime_ns / 1e9, tz=timezone.utc).replace(microsecond=0)
+
+
+def _signature(paths):
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            signature.append(None)
+            continue
+        signature.append((st.st_mtime_ns, st.st_size))
+    return tuple(signature)
+
+
+class Payload:
+    """Response body with validators, computed once per data version."""
+
+    def __init__(self, body: bytes, etag: str, last_modified: datetime):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+class PayloadCache:
+    """
+    Memoize response bodies derived from files on disk.
+
+    Each payload is keyed on a caller-supplied key and the (mtime, size) of its
+    source files, so the body and its ETag are only rebuilt after a file changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._payloads = {}
+
+    def peek(self, key, sources):
+        """The payload if it is cached and current, without building it (only stats the sources)."""
+        cached = self._payloads.get(key)
+        if cached is not None and cached[0] == _signature(sources):
+            return cached[1]
+        return None
+
+    def get(self, key, sources, build) -> Payload:
+        """
+        :param key: Identifies the payload (e.g. endpoint and query arguments)
+        :param sources: Files the payload is built from
+        :param build: Callable returning the body bytes
+        """
+        signature = _signature(sources)
+        cached = self._payloads.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        body = build()
+        mtimes = [s[0] for s in signature if s is not None]
+        last_modified = mtime_to_datetime(max(mtimes)) if mtimes else None
+        payload = Payload(body, content_etag(body), last_modified)
+        with self._lock:
+            self._payloads[key] = (signature, payload)
+        return payload
+
+
+class FileValidatorCache:
+    """Content-hash ETags and Last-Modified dates for served files, hashed once per file version."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._validators = {}
+
+    def peek(self, path):
+        """(etag, last_modified) if the file's validators are cached and current, without hashing it."""
+        path = os.path.normpath(path)
+        cached = self._validators.get(path)
+        if cached is not None and cached[0] == _signature([path])[0]:
+            return cached[1]
+        return None
+
+    def get(self, path):
+        path = os.path.normpath(path)
+        signature = _signature([path])[0]
+        cached = self._validators.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        validators = (file_etag(path), mtime_to_datetime(signature[0]))
+        with self._lock:
+            self._validators[path] = (signature, validators)
+        return validators
+
+
+def headers_not_modified(method, headers, etag, last_modified) -> bool:
+    """Check If-None-Match / If-Modified-Since in any framework's request headers."""
+    if method not in ("GET", "HEAD"):
+        return False
+    if_none_match = headers.get("If-None-Match")
+    if_modified_since = headers.get("If-Modified-Since")
+    if not if_none_match and not if_modified_since:
+        return False
+    return not is_resource_modified(http_if_none_match=if_none_match, http_if_modified_since=if_modified_since,
+                                    etag=etag, last_modified=last_modified)
+
+
+def is_not_modified(etag, last_modified) -> bool:
+    """Check If-None-Match / If-Modified-Since on the current request."""
+    return headers_not_modified(request.method, request.headers, etag, last_modified)
+
+
+def validator_headers(etag, last_modified) -> dict:
+    """The headers set_validators adds, for responses built outside Flask (e.g. the ASGI routes)."""
+    headers = {"Cache-Control": "no-cache"}
+    if etag is not None:
+        headers["ETag"] = quote_etag(etag, weak=True)
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def set_validators(response, etag, last_modified):
+    """
+    Attach validators to a response. ETags are weak so Flask-Compress leaves them
+    untouched and clients send back a tag that matches before anything is compressed.
+    """
+    if etag is not None:
+        response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True  # Always revalidate, the 304 is cheap
+    return response
+
+
+def not_modified_response(etag, last_modified) -> Response:
+    return set_validators(Response(status=304), etag, last_modified)
+
+
+def conditional_payload_response(payload: Payload, mimetype="application/json") -> Response:
+    """Return a 304 if the client already has this payload, otherwise the full body."""
+    if is_not_modified(payload.etag, payload.last_modified):
+        return not_modified_response(payload.etag, payload.last_modified)
+    return set_validators(Response(payload.body, mimetype=mimetype), payload.etag, payload.last_modified)
@@ -0,0 +1,171 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+
+def _pid_alive(pid) -> bool:
+    if os.name != "posix":
+        return True  # No cheap check without signalling the process
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobManager:
+    """
+    Run slow work (exports, uploads) on a small thread pool instead of the request thread.
+
+    Every job is persisted as data/_jobs/<id>.json and rewritten on each state change,
+    so any server process can report a job's status, progress and result, and jobs
+    orphaned by a restart are reported as failed instead of running forever.
+    """
+
+    def __init__(self, job_dir, max_workers=2, keep=200):
+        """
+        :param job_dir: Folder for the job records
+        :param max_workers: Jobs run at the same time
+        :param keep: Finished job records kept on disk
+        """
+        self.job_dir = job_dir
+        self.max_workers = max_workers
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._executor = None
+        self._active = 0  # Jobs queued or running in this process
+        os.makedirs(job_dir, exist_ok=True)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Created on first use, so a server that forks workers after import starts its threads per worker
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+            return self._executor
+
+    def _path(self, job_id) -> str:
+        return os.path.join(self.job_dir, f"{job_id}.json")
+
+    def _write(self, job: dict):
+        path = self._path(job["id"])
+        temp_path = f"{path}.tmp{os.getpid()}_{threading.get_ident()}"
+        with open(temp_path, "w") as f:
+            json.dump(job, f, indent=2, default=str)
+        os.replace(temp_path, path)
+
+    def _update(self, job_id, **fields):
+        job = self._read(job_id)
+        if job is None:
+            return
+        job.update(fields)
+        self._write(job)
+
+    def _read(self, job_id):
+        try:
+            with open(self._path(job_id), "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def submit(self, kind, func, *args, **kwargs) -> dict:
+        """
+        Queue a job and return its record right away.
+        :param kind: Job type, e.g. 'export-excel'
+        :param func: Callable run as func(*args, progress=..., **kwargs); its return value
+                     (JSON-serializable) becomes the job result
+        """
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "status": QUEUED,
+            "progress": 0.0,
+            "message": "Queued",
+            "result": None,
+            "error": None,
+            "details": None,
+            "pid": os.getpid(),
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+        }
+        self._write(job)
+        with self._lock:
+            self._active += 1
+        self._get_executor().submit(self._run, job["id"], func, args, kwargs)
+        self._prune()
+        return job
+
+    def _run(self, job_id, func, args, kwargs):
+        try:
+            self._run_job(job_id, func, args, kwargs)
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def _run_job(self, job_id, func, args, kwargs):
+        self._update(job_id, status=RUNNING, started=time.time(), message="Running")
+
+        def progress(fraction, message=None):
+            fields = {"progress": round(min(max(float(fraction), 0.0), 1.0), 3)}
+            if message:
+                fields["message"] = message
+            self._update(job_id, **fields)
+
+        try:
+            result = func(*args, progress=progress, **kwargs)
+        except Exception as e:
+            logging.exception(f"Job {job_id} failed")
+            # Exceptions may carry JSON-serializable details for the client, e.g. a validation report
+            self._update(job_id, status=FAILED, error=str(e), details=getattr(e, "details", None),
+                         message="Failed", finished=time.time())
+            return
+        self._update(job_id, status=DONE, progress=1.0, message="Done", result=result, finished=time.time())
+
+    def active(self) -> int:
+        """Jobs queued or running in this process (the server must not recycle it while any are)."""
+        with self._lock:
+            return self._active
+
+    def get(self, job_id):
+        """Current job record, or None for an unknown id."""
+        if not job_id or not all(c in "0123456789abcdef" for c in job_id):
+            return None
+        job = self._read(job_id)
+        if job and job["status"] in ACTIVE_STATES and job["pid"] != os.getpid() and not _pid_alive(job["pid"]):
+            job.update(status=FAILED, error="Interrupted by a server restart", message="Failed",
+                       finished=time.time())
+            self._write(job)
+        return job
+
+    def list(self, limit=50) -> list:
+        jobs = [self._read(os.path.splitext(os.path.basename(p))[0])
+                for p in glob.glob(os.path.join(glob.escape(self.job_dir), "*.json"))]
+        jobs = sorted((j for j in jobs if j), key=lambda j: j["created"], reverse=True)
+        return jobs[:limit]
+
+    def _prune(self):
+        paths = glob.glob(os.path.join(glob.escape(self.job_dir), "*.json"))
+        if len(paths) <= self.keep:
+            return
+        paths.sort(key=os.path.getmtime, reverse=True)
+        for path in paths[self.keep:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        counts = {}
+        for job in self.list(limit=self.keep):
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return counts
@@ -0,0 +1,66 @@
+import json
+
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # Optional fast encoder
+    orjson = None
+
+DEFAULT_CHUNK_ROWS = 2000
+BACKENDS = ("pandas", "orjson", "json")
+
+
+def _chunk_columns(chunk: pd.DataFrame) -> list:
+    """Column values as Python lists with missing values as None."""
+    columns = []
+    for col in chunk.columns:
+        values = chunk[col]
+        if values.hasnans:
+            values = values.astype(object).where(values.notna(), None)
+        columns.append(values.tolist())
+    return columns
+
+
+def _encode_chunk(chunk: pd.DataFrame, backend: str) -> bytes:
+    """Encode a chunk of rows as comma separated JSON objects, without the enclosing brackets."""
+    if backend == "pandas":
+        # pandas' C encoder works straight from the columns
+        return chunk.to_json(orient="records", date_format="iso").encode("utf-8")[1:-1]
+
+    keys = [str(c) for c in chunk.columns]
+    rows = [dict(zip(keys, row)) for row in zip(*_chunk_columns(chunk))]
+    if backend == "orjson":
+        return orjson.dumps(rows, default=str)[1:-1]
+    return json.dumps(rows, default=str, separators=(",", ":")).encode("utf-8")[1:-1]
+
+
+def check_backend(backend) -> str:
+    """The backend name if it can be used here; raises ValueError otherwise (e.g. for a bad setting)."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown JSON backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+    if backend == "orjson" and orjson is None:
+        raise ValueError("orjson backend requested but orjson is not installed")
+    return backend
+
+
+def iter_json_records(df: pd.DataFrame, chunk_rows=DEFAULT_CHUNK_ROWS, backend=None):
+    """
+    Yield a DataFrame as a JSON array of records, one chunk of rows at a time.
+    Only one chunk is ever held as Python objects, so the response can start before
+    the whole payload is built.
+    :param df: frame to encode
+    :param chunk_rows: rows per yielded chunk
+    :param backend: 'pandas' (C encoder working from the columns), 'orjson' or 'json'
+    """
+    backend = check_backend(backend or "pandas")
+
+    yield b"["
+    first = True
+    for start in range(0, len(df), chunk_rows):
+        body = _encode_chunk(df.iloc[start:start + chunk_rows], backend)
+        if not body:
+            continue
+        yield body if first else b"," + body
+        first = False
+    yield b"]"
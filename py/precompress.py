@@ -0,0 +1,112 @@
+import gzip
+import os
+import sys
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip siblings are still written
+    brotli = None
+
+# Encodings in order of preference, with the sibling file suffix for each
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+COMPRESSIBLE_EXTENSIONS = {".geojson", ".json", ".csv", ".arrow", ".js", ".mjs", ".css", ".html", ".svg", ".txt"}
+MIN_SIZE = 1024
+# Smallest output for offline builds; request paths that compress under a lock pass lower levels
+BROTLI_QUALITY = 11
+GZIP_LEVEL = 9
+
+
+def _atomic_write(path, data: bytes):
+    temp_path = f"{path}.tmp{os.getpid()}"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def write_precompressed(path, min_size=MIN_SIZE, brotli_quality=BROTLI_QUALITY, gzip_level=GZIP_LEVEL):
+    """
+    Write .gz and .br siblings for a file so it can be served without compressing per request.
+    Files smaller than min_size are skipped and any stale siblings removed.
+    :param path: file to compress
+    :param min_size: smallest file worth compressing
+    :param brotli_quality: 0-11; 11 is several times slower than 5 for a few percent smaller output
+    :param gzip_level: 1-9
+    :return: list of sibling paths written
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    written = []
+    if len(data) < min_size:
+        remove_precompressed(path)
+        return written
+
+    _atomic_write(path + ENCODINGS["gzip"], gzip.compress(data, compresslevel=gzip_level, mtime=0))
+    written.append(path + ENCODINGS["gzip"])
+    if brotli is not None:
+        _atomic_write(path + ENCODINGS["br"], brotli.compress(data, quality=brotli_quality))
+        written.append(path + ENCODINGS["br"])
+    return written
+
+
+def remove_precompressed(path):
+    for suffix in ENCODINGS.values():
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def precompress_tree(root, extensions=None, min_size=MIN_SIZE):
+    """
+    Precompress every matching file under a folder, skipping siblings that are already up to date.
+    :param root: folder to walk
+    :param extensions: file extensions to compress
+    :param min_size: smallest file worth compressing
+    :return: number of files compressed
+    """
+    if extensions is None:
+        extensions = COMPRESSIBLE_EXTENSIONS
+    count = 0
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if os.path.splitext(filename)[1].lower() not in extensions:
+                continue
+            path = os.path.join(dirpath, filename)
+            if find_precompressed(path, "gzip") and (brotli is None or find_precompressed(path, "br")):
+                continue
+            if write_precompressed(path, min_size):
+                print(f"\tPrecompressed {path}")
+                count += 1
+    return count
+
+
+def find_precompressed(path, encoding):
+    """Return the sibling for an encoding if it exists and is not older than the source file."""
+    sibling = path + ENCODINGS[encoding]
+    try:
+        if os.stat(sibling).st_mtime_ns >= os.stat(path).st_mtime_ns:
+            return sibling
+    except FileNotFoundError:
+        pass
+    return None
+
+
+def pick_precompressed(path, accept_encodings):
+    """
+    Choose the best precompressed variant the client accepts.
+    :param path: source file path
+    :param accept_encodings: werkzeug Accept object from request.accept_encodings
+    :return: (path to serve, content encoding or None)
+    """
+    for encoding in ENCODINGS:
+        if accept_encodings[encoding] > 0:
+            sibling = find_precompressed(path, encoding)
+            if sibling:
+                return sibling, encoding
+    return path, None
+
+
+if __name__ == "__main__":
+    folders = sys.argv[1:] or ["../data/spatial", "../data/mapbox_metadata", "../static"]
+    for folder in folders:
+        print(f"Precompressing {folder}...")
+        print(f"\t{precompress_tree(folder)} files written")
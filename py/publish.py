@@ -0,0 +1,194 @@
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class PublishLockTimeout(RuntimeError):
+    pass
+
+
+class FileLock:
+    """
+    Exclusive lock on a lock file, shared by the web app and the CLI scripts.
+    Uses flock on POSIX and msvcrt.locking on Windows; the lock is released
+    if the holding process dies.
+    """
+
+    _thread_locks = {}
+    _thread_locks_guard = threading.Lock()
+
+    def __init__(self, path, timeout=120.0, poll=0.1):
+        self.path = os.path.abspath(path)
+        self.timeout = timeout
+        self.poll = poll
+        self._file = None
+        # Threads of one process also wait on each other before touching the file
+        with self._thread_locks_guard:
+            self._thread_lock = self._thread_locks.setdefault(self.path, threading.Lock())
+
+    def _try_lock(self) -> bool:
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        if not self._thread_lock.acquire(timeout=self.timeout):
+            raise PublishLockTimeout(f"Timed out waiting for {self.path}")
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._file = open(self.path, "a+")
+            while not self._try_lock():
+                if time.monotonic() > deadline:
+                    raise PublishLockTimeout(f"Timed out waiting for {self.path}")
+                time.sleep(self.poll)
+        except BaseException:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._thread_lock.release()
+            raise
+
+    def release(self):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
+            self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+def _fsync_file(path):
+    with open(path, "rb+") as f:
+        os.fsync(f.fileno())
+
+
+def _fsync_dir(path):
+    if os.name != "posix":
+        return  # Directories cannot be opened for fsync on Windows
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Publication:
+    """
+    One coordinated write of the tracking data outputs (GeoJSON, CSV, JSON, Arrow, shapefile, Excel).
+
+    Writers ask for a staging path per output and write there. On a clean exit
+    every staged file is fsynced and renamed over its target, then the version
+    marker is bumped; on an error the staging folders are removed and the served
+    files are left untouched. The whole publication holds the publish file lock,
+    so the web app and the CLI scripts never interleave their writes.
+
+        with Publication(lock_file, marker_file, bump_version=update_last_modified) as pub:
+            gdf.to_file(pub.stage(tracking_file), driver="GeoJSON")
+            df.to_csv(pub.stage(csv_file), index=False)
+    """
+
+    def __init__(self, lock_file, marker_file=None, bump_version=None, timeout=120.0):
+        """
+        :param lock_file: Lock file shared by every writer of the data folder
+        :param marker_file: Version marker bumped after the swap
+        :param bump_version: Callable(marker_file) that increments the version marker
+        :param timeout: Seconds to wait for another publication to finish
+        """
+        self.lock = FileLock(lock_file, timeout=timeout)
+        self.marker_file = marker_file
+        self.bump_version = bump_version
+        self.token = uuid.uuid4().hex[:12]
+        self._staging = {}  # staging folder -> target folder
+        self.published = []
+
+    def _staging_dir(self, target_dir) -> str:
+        target_dir = os.path.abspath(target_dir or ".")
+        for staging_dir, staged_target in self._staging.items():
+            if staged_target == target_dir:
+                return staging_dir
+        # Inside the target folder, so the final rename never crosses file systems
+        staging_dir = os.path.join(target_dir, f".staging-{self.token}")
+        os.makedirs(staging_dir, exist_ok=True)
+        self._staging[staging_dir] = target_dir
+        return staging_dir
+
+    def stage(self, target_path) -> str:
+        """
+        Path to write an output to. Every file written into the same staging folder
+        (e.g. a shapefile's .dbf/.shx/.prj siblings) is published next to the target.
+        """
+        target_dir, filename = os.path.split(target_path)
+        return os.path.join(self._staging_dir(target_dir), filename)
+
+    def stage_copy(self, source_path, target_path) -> str:
+        """Stage an existing file (e.g. written to a temp folder) for publishing."""
+        staged = self.stage(target_path)
+        shutil.copy2(source_path, staged)
+        return staged
+
+    def __enter__(self):
+        self.lock.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            if exc_type is None:
+                self._commit()
+        finally:
+            self._cleanup()
+            self.lock.release()
+
+    def _commit(self):
+        start = time.perf_counter()
+        staged = []
+        for staging_dir, target_dir in self._staging.items():
+            for filename in sorted(os.listdir(staging_dir)):
+                source = os.path.join(staging_dir, filename)
+                if os.path.isfile(source):
+                    _fsync_file(source)
+                    staged.append((source, os.path.join(target_dir, filename)))
+        if not staged:
+            # Nothing was staged (e.g. the data turned out unchanged): no swap and no new version
+            return
+
+        # Everything is durable before the first rename, so the swap is only renames
+        for source, target in staged:
+            os.replace(source, target)
+            self.published.append(target)
+        for target_dir in set(self._staging.values()):
+            _fsync_dir(target_dir)
+
+        if self.marker_file and self.bump_version:
+            self.bump_version(self.marker_file)
+        logging.info(f"Published {len(self.published)} files in {time.perf_counter() - start:.3f}s")
+
+    def _cleanup(self):
+        for staging_dir in self._staging:
+            shutil.rmtree(staging_dir, ignore_errors=True)
@@ -1,48 +1,397 @@
+import copy
+import hashlib
+import io
 import json
 import os
+import threading
 import toml
+import warnings
+import zipfile
+from types import MappingProxyType
 from typing import Tuple, Union
 import geopandas as gpd
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
 import logging
 import datetime
+import time
 import openpyxl
-from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from openpyxl.utils import get_column_letter
-from openpyxl.worksheet.table import Table, TableStyleInfo
+from openpyxl.worksheet.table import Table, TableColumn, TableStyleInfo
 
 
 
-DEBUG_MODE = True
+DEBUG_MODE = os.getenv("DEBUG_MODE", "false").lower() in ("1", "true", "yes")
 logging.basicConfig(level=logging.DEBUG if DEBUG_MODE else logging.INFO)
 
 
+def _freeze(value):
+    """Recursively convert dicts and lists to read-only mappings and tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+# Column entries in the metadata that are not column names of a format
+COLUMN_INFO_KEYS = {"dtype", "validate"}
+
+# Values treated as empty rather than as failed conversions
+EMPTY_VALUES = {"", "None", "none", "nan", "NaN", "NaT", "null"}
+
+
+class TypeReport:
+    """Timing and conversion errors from applying a TypePlan."""
+
+    def __init__(self, source_format):
+        self.source_format = source_format
+        self.columns = {}
+        self.total_seconds = 0.0
+
+    def add_batch(self, columns, dtype, seconds, errors):
+        """Record a batched conversion, giving each column an equal share of its time."""
+        share = seconds / len(columns) if columns else 0.0
+        for col in columns:
+            self.columns[col] = {"dtype": dtype, "seconds": share, "errors": int(errors.get(col, 0))}
+        self.total_seconds += seconds
+
+    @property
+    def errors(self) -> dict:
+        return {col: info["errors"] for col, info in self.columns.items() if info["errors"]}
+
+    def to_dict(self) -> dict:
+        return {"source_format": self.source_format, "total_seconds": self.total_seconds,
+                "columns": self.columns}
+
+
+def _is_present(values: np.ndarray) -> np.ndarray:
+    """Mask of values that hold something other than a null or an empty placeholder."""
+    present = ~pd.isna(values)
+    if present.any():
+        as_text = pd.Series(values[present], dtype=object).astype(str).str.strip()
+        present[present] = ~as_text.isin(EMPTY_VALUES).to_numpy()
+    return present
+
+
+class TypePlan:
+    """
+    Column conversions compiled from the metadata for one source format.
+
+    Columns of the same target type are converted together: date columns are
+    flattened into one array, parsed and formatted in a single pass, then split back.
+    Failed conversions still coerce to empty/0 but are counted in the TypeReport.
+    """
+
+    def __init__(self, dtypes, source_format):
+        self.source_format = source_format
+        self.date_columns = tuple(c for c, t in dtypes.items() if c is not None and t == "date")
+        self.string_columns = tuple(c for c, t in dtypes.items() if c is not None and t == "string")
+        self.numeric_columns = tuple(c for c, t in dtypes.items() if c is not None and t == "numeric")
+
+    @staticmethod
+    def _flatten(df, columns) -> np.ndarray:
+        # Column-major, so each column is a contiguous block of len(df) values
+        return df[list(columns)].to_numpy(dtype=object).ravel(order="F")
+
+    @staticmethod
+    def _errors_by_column(failed, columns, n_rows) -> dict:
+        counts = failed.reshape(len(columns), n_rows).sum(axis=1) if n_rows else [0] * len(columns)
+        return dict(zip(columns, counts))
+
+    def _convert_dates(self, df, columns, string_dtype, report):
+        start = time.perf_counter()
+        n_rows = len(df)
+        days = np.empty((len(columns), n_rows), dtype="datetime64[D]")
+        errors = {}
+
+        # Columns already read as datetimes only need truncating to days
+        text_rows = []
+        for i, col in enumerate(columns):
+            if pd.api.types.is_datetime64_any_dtype(df[col]):
+                series = df[col]
+                if series.dt.tz is not None:
+                    series = series.dt.tz_localize(None)
+                days[i] = series.to_numpy().astype("datetime64[D]")
+            else:
+                text_rows.append(i)
+
+        # Everything else is flattened and parsed in one pass, once per unique value
+        if text_rows:
+            text_columns = [columns[i] for i in text_rows]
+            codes, uniques = pd.factorize(self._flatten(df, text_columns))  # Nulls get code -1
+            uniques = np.asarray(uniques, dtype=object)
+            parsed = pd.to_datetime(pd.Series(uniques, dtype=object), errors="coerce")
+            failed = parsed.isna().to_numpy(copy=True)
+            if failed.any():
+                failed[failed] = _is_present(uniques[failed])
+            if failed.any():
+                # Values the inferred format missed get one more try with per-value parsing
+                parsed[failed] = pd.to_datetime(pd.Series(uniques[failed], dtype=object), errors="coerce",
+                                                format="mixed").to_numpy()
+                failed[failed] = parsed[failed].isna().to_numpy()
+            if parsed.dt.tz is not None:
+                parsed = parsed.dt.tz_localize(None)
+
+            # Trailing NaT / not-failed entries catch the -1 null codes
+            unique_days = np.append(parsed.to_numpy().astype("datetime64[D]"), np.datetime64("NaT", "D"))
+            days[text_rows] = unique_days[codes].reshape(len(text_rows), n_rows)
+            errors = self._errors_by_column(np.append(failed, False)[codes], text_columns, n_rows)
+
+        # Format each distinct day once
+        distinct_days, inverse = np.unique(days.ravel(), return_inverse=True)
+        formatted = np.datetime_as_string(distinct_days).astype(object)
+        formatted[np.isnat(distinct_days)] = ""
+        formatted = formatted[inverse.ravel()]
+
+        blocks = formatted.reshape(len(columns), n_rows)
+        for i, col in enumerate(columns):
+            df[col] = pd.array(blocks[i], dtype=string_dtype)
+        report.add_batch(columns, "date", time.perf_counter() - start, errors)
+        return df
+
+    @staticmethod
+    def _convert_strings(df, columns, string_dtype, report):
+        start = time.perf_counter()
+        converted = df[list(columns)].astype(string_dtype)
+        for col in columns:
+            df[col] = converted[col]
+        report.add_batch(columns, "string", time.perf_counter() - start, {})
+        return df
+
+    def _convert_numerics(self, df, columns, numeric_dtype, report):
+        start = time.perf_counter()
+        n_rows = len(df)
+        values = self._flatten(df, columns)
+        numbers = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce")
+        failed = numbers.isna().to_numpy(copy=True)
+        if failed.any():
+            failed[failed] = _is_present(values[failed])
+        blocks = numbers.fillna(0).to_numpy(dtype="float64").reshape(len(columns), n_rows)
+        for i, col in enumerate(columns):
+            df[col] = pd.array(blocks[i], dtype=numeric_dtype)
+        report.add_batch(columns, "numeric", time.perf_counter() - start,
+                         self._errors_by_column(failed, columns, n_rows))
+        return df
+
+    def apply(self, df, arrow=False):
+        """
+        Convert the columns of df in place.
+        :param df: DataFrame with columns named in the plan's source format
+        :param arrow: return Arrow-backed string and numeric columns (requires pyarrow)
+        :return: df, TypeReport
+        """
+        string_dtype = "string[pyarrow]" if arrow else "string"
+        numeric_dtype = "double[pyarrow]" if arrow else "float64"
+        report = TypeReport(self.source_format)
+
+        conversions = [(self._convert_dates, self.date_columns, string_dtype),
+                       (self._convert_strings, self.string_columns, string_dtype),
+                       (self._convert_numerics, self.numeric_columns, numeric_dtype)]
+        for convert, plan_columns, dtype in conversions:
+            columns = [c for c in plan_columns if c in df.columns]
+            if not columns:
+                continue
+            try:
+                df = convert(df, columns, dtype, report)
+            except Exception as e:
+                logging.error(f"Error converting {columns} to {dtype}: {e}")
+
+        if report.errors:
+            logging.warning(f"Type conversion errors ({self.source_format}): {report.errors}")
+        return df, report
+
+
+def sort_codes(values: pd.Series, ascending=True, na_position="last") -> np.ndarray:
+    """Integer sort key for a column, with direction and null placement applied."""
+    try:
+        codes, uniques = pd.factorize(values, sort=True)
+    except TypeError:  # Mixed types that cannot be compared
+        codes, uniques = pd.factorize(values.astype(str), sort=True)
+    codes = codes.astype(np.int64)
+    n_unique = len(uniques)
+    missing = codes < 0
+    if not ascending:
+        codes = n_unique - 1 - codes
+    codes[missing] = -1 if na_position == "first" else n_unique
+    return codes
+
+
+class SortPlan:
+    """
+    One stable lexicographic sort over all configured keys.
+
+    sort_order entries in the metadata are either a column key, or an object such as
+    {"column": "TO_Area", "ascending": true, "na_position": "last"}. The first entry is
+    the primary key. Keys are matched against the frame's columns by universal key or by
+    the column name in any format.
+    """
+
+    def __init__(self, sort_order, forward_maps):
+        self.keys = []
+        for entry in sort_order:
+            if isinstance(entry, str):
+                key, ascending, na_position = entry, True, "last"
+            else:
+                key = entry["column"]
+                ascending = entry.get("ascending", True)
+                na_position = entry.get("na_position", "last")
+            names = [key] + [names[key] for names in forward_maps.values() if names.get(key) not in (None, key)]
+            self.keys.append((tuple(dict.fromkeys(names)), bool(ascending), na_position))
+
+    def resolve(self, columns) -> list:
+        """(column name, ascending, na_position) for each key present in columns."""
+        resolved = []
+        for names, ascending, na_position in self.keys:
+            name = next((n for n in names if n in columns), None)
+            if name is not None:
+                resolved.append((name, ascending, na_position))
+        return resolved
+
+    def permutation(self, df) -> np.ndarray:
+        resolved = self.resolve(df.columns)
+        if not resolved:
+            return np.arange(len(df))
+        # np.lexsort treats the last key as primary
+        codes = [sort_codes(df[name], ascending, na_position) for name, ascending, na_position in resolved]
+        return np.lexsort(codes[::-1])
+
+    def apply(self, df):
+        return df.iloc[self.permutation(df)]
+
+
+class TableMetadata:
+    """Immutable, parsed table metadata with per-format lookups computed once."""
+
+    def __init__(self, metadata_file, raw: dict, version: str):
+        self.metadata_file = metadata_file
+        self.version = version  # Content hash of the metadata JSON
+        self._raw = raw
+        self.metadata = _freeze(raw)
+        columns = self.metadata["columns"]
+
+        formats = set()
+        for info in columns.values():
+            formats.update(k for k in info if k not in COLUMN_INFO_KEYS)
+        self.formats = tuple(sorted(formats))
+
+        # Forward maps: universal key -> column name, in metadata order (names may be None)
+        self.forward_maps = MappingProxyType({
+            fmt: MappingProxyType({key: info[fmt] for key, info in columns.items() if fmt in info})
+            for fmt in self.formats})
+        # Reverse maps: column name -> universal key
+        self.reverse_maps = MappingProxyType({
+            fmt: MappingProxyType({info[fmt]: key for key, info in columns.items() if fmt in info})
+            for fmt in self.formats})
+        # Target column order per format
+        self.column_orders = MappingProxyType({fmt: tuple(self.forward_maps[fmt].values()) for fmt in self.formats})
+        # Column name -> dtype per format
+        self.dtypes = MappingProxyType({
+            fmt: MappingProxyType({info.get(fmt): info.get("dtype") for info in columns.values()})
+            for fmt in self.formats})
+        self.sort_order = tuple(self.metadata.get("sort_order", ()))
+        self.sort_plan = SortPlan(self.sort_order, self.forward_maps)
+        self._type_plans = {}
+
+    def type_plan(self, source_format) -> TypePlan:
+        """Compiled type plan for a source format, built once per metadata version."""
+        plan = self._type_plans.get(source_format)
+        if plan is None:
+            plan = TypePlan(self.dtypes[source_format], source_format)
+            self._type_plans[source_format] = plan
+        return plan
+
+    def to_dict(self) -> dict:
+        """Mutable deep copy of the metadata, e.g. for JSON responses."""
+        return copy.deepcopy(self._raw)
+
+
+class MetadataRegistry:
+    """
+    Shared cache of parsed metadata files.
+
+    A file is re-parsed only when its mtime or size changes, and its TOML mirror
+    is only rewritten when the parsed content differs from what is on disk.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, metadata_file) -> TableMetadata:
+        key = os.path.abspath(metadata_file)
+        st = os.stat(key)
+        signature = (st.st_mtime_ns, st.st_size)
+        cached = self._entries.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+
+            with open(key, "rb") as f:
+                content = f.read()
+            version = hashlib.blake2b(content, digest_size=16).hexdigest()
+            if cached is not None and cached[1].version == version:
+                # Touched but unchanged
+                table_metadata = cached[1]
+            else:
+                table_metadata = TableMetadata(metadata_file, json.loads(content), version)
+                self._write_toml_mirror(table_metadata)
+                logging.debug(f"Loaded metadata {metadata_file} (version {version})")
+            self._entries[key] = (signature, table_metadata)
+            return table_metadata
+
+    @staticmethod
+    def _write_toml_mirror(table_metadata: TableMetadata):
+        toml_file = table_metadata.metadata_file.replace(".json", ".toml")
+        try:
+            rendered = toml.dumps(table_metadata.to_dict())
+        except (TypeError, ValueError) as e:
+            # The JSON is the source of truth, a mirror that can't be expressed in TOML is skipped
+            logging.warning(f"Could not write TOML mirror {toml_file}: {e}")
+            return
+        if os.path.exists(toml_file):
+            with open(toml_file, "r") as tf:
+                if tf.read() == rendered:
+                    return
+        with open(toml_file, "w") as tf:
+            tf.write(rendered)
+
+
+METADATA_REGISTRY = MetadataRegistry()
+
+
 class StatusTableManager:
     """Class to manage the metadata and formatting of a status table."""
 
     def __init__(self, metadata_file):
         self.metadata_file = metadata_file
+        self.table_metadata = None
         self.metadata = None
+        self.last_type_report = None
 
     def __enter__(self):
-        """Load the metadata file when entering the context."""
-        with open(self.metadata_file, 'r') as f:
-            self.metadata = json.load(f)
+        """Get the parsed metadata from the shared registry when entering the context."""
+        self.table_metadata = METADATA_REGISTRY.get(self.metadata_file)
+        self.metadata = self.table_metadata.metadata
         return self  # Return the instance to use in the context block
 
     def __exit__(self, exc_type, exc_value, traceback):
         """Clean up when exiting the context (if necessary)."""
-        self._write_toml()  # Write the metadata back to the TOML file
-        self.metadata = None  # Clear metadata from memory
+        self.table_metadata = None
+        self.metadata = None  # Release the shared metadata
         # Optional: Handle exceptions here if needed
         if exc_type:
             print(f"An exception of type {exc_type} occurred: {exc_value}")
         return False  # Returning False will propagate the exception, True will suppress it
 
-    def _write_toml(self):
-        json_to_toml(self.metadata_file)
-
     def get_column_names(self, target_format):
         """Get column names for a specific format."""
         return {key: value.get(target_format) for key, value in
@@ -61,14 +410,14 @@ class StatusTableManager:
             pd.DataFrame: The DataFrame with renamed columns.
         """
         # Reverse lookup to get universal keys from current column names
-        reverse_map = {v[current_format]: k for k, v in self.metadata["columns"].items() if current_format in v}
+        reverse_map = self.table_metadata.reverse_maps[current_format]
+        forward_map = self.table_metadata.forward_maps[target_format]
 
         # Map current column names to universal keys
         universal_columns = {reverse_map.get(col, col): col for col in df.columns}
 
         # Map universal keys to target column names
-        column_map = {key: self.metadata["columns"][key][target_format] for key in universal_columns if
-                      key in self.metadata["columns"]}
+        column_map = {key: forward_map[key] for key in universal_columns if key in forward_map}
 
         # Rename the DataFrame columns
         df = df.rename(columns={universal_columns[key]: column_map[key] for key in column_map})
@@ -79,44 +428,21 @@ class StatusTableManager:
                 df[target_col] = None  # Default value for missing columns
 
         # Reorder columns to match the target format
-        target_columns = [self.metadata["columns"][key][target_format] for key in self.metadata["columns"] if
-                          target_format in self.metadata["columns"][key]]
+        target_columns = self.table_metadata.column_orders[target_format]
         return df[[col for col in target_columns if col in df.columns]]
 
     def sort_rows(self, df):
-        """Sort rows of a DataFrame by a specific column."""
-        for col in self.metadata.get("sort_order", []):
-            if col in df.columns:
-                df = df.sort_values(by=col)
-        return df
+        """Sort rows by the metadata sort_order in one stable pass."""
+        return self.table_metadata.sort_plan.apply(df)
 
-    def enforce_types(self, df, current_format="geojson"):
-        """Enforce column data types based on metadata and current column names."""
-        # Map current column names to metadata names
-        column_map = {v[current_format]: k for k, v in self.metadata["columns"].items()}
-        for current_col, metadata_col in column_map.items():
-            if current_col in df.columns:  # Check if the column exists in the DataFrame
-                tgt_dtype = self.metadata["columns"][metadata_col].get("dtype")
-
-                if tgt_dtype == "date":
-                    # Convert to date format without times
-                    try:
-                        df[current_col] = pd.to_datetime(df[current_col], errors="coerce")
-                        df[current_col] = df[current_col].dt.strftime('%Y-%m-%d')
-                        df[current_col] = df[current_col].fillna('')
-                    except Exception as e:
-                        logging.debug("Target dtype: %s", tgt_dtype)
-                        print(f"Error processing column {current_col}: {e}")
-                elif tgt_dtype == "string":
-                    try:
-                        # Convert to string
-                        df[current_col] = df[current_col].astype(str)
-                    except Exception as e:
-                        logging.debug("Target dtype: %s", tgt_dtype)
-                        print(f"Error processing column {current_col}: {e}")
-                # Add other type conversions as needed (e.g., numeric)
-                elif tgt_dtype == "numeric":
-                    df[current_col] = pd.to_numeric(df[current_col], errors="coerce").fillna(0)
+    def enforce_types(self, df, current_format="geojson", arrow=False):
+        """
+        Enforce column data types based on metadata and current column names.
+        Dates become 'YYYY-MM-DD' strings ('' when missing), strings use the nullable string dtype and
+        numerics are floats with missing values as 0. The timing and error report is kept on
+        last_type_report.
+        """
+        df, self.last_type_report = self.table_metadata.type_plan(current_format).apply(df, arrow=arrow)
         return df
 
 
@@ -184,91 +510,168 @@ def df_to_excel_for_export(df: pd.DataFrame, out_loc: str, filename=None, sheetn
         if "legend" in c.lower():
             df.drop(columns=c, inplace=True)
 
-    # Create a new workbook and worksheet
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = sheetname
-
+    # Column widths from the frame: longest rendered value per column, vectorized
+    widths = excel_column_widths(df, merged_headers)
+
+    # Openpyxl writes the styled parts (widths, headers, merges, frozen panes, table) into a
+    # write-only workbook; the data rows are generated in bulk and spliced into its sheet
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheetname)
+    for col_idx, width in enumerate(widths, start=1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = width
+
+    def styled_cell(value, font, fill=None):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.font = font
+        if fill is not None:
+            cell.fill = fill
+        cell.alignment = Alignment(horizontal='center', vertical='center')
+        return cell
+
+    header_rows = []
     # Apply merged headers if provided
     if merged_headers:
         # Create a Font object with the desired font name
         custom_font = Font(name='Century Gothic', size=12, bold=True, color='F7F7F7')
         dark_background_fill = PatternFill(start_color='000033', end_color='000033', fill_type='solid')
+        merged_row = []
         current_col = 1
         for header in merged_headers:
-            start_col = current_col
             colspan = header.get('colspan', 1)
-            end_col = current_col + colspan - 1
-            cell = ws.cell(row=1, column=start_col)
-            cell.value = header['text']
-            cell.font = custom_font
-            cell.fill = dark_background_fill
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-
+            merged_row.append(styled_cell(header['text'], custom_font, dark_background_fill))
+            merged_row.extend([None] * (colspan - 1))
             if colspan > 1:
-                ws.merge_cells(start_row=1, start_column=start_col, end_row=1, end_column=end_col)
-
+                ws.merged_cells.add(f"{get_column_letter(current_col)}1:"
+                                    f"{get_column_letter(current_col + colspan - 1)}1")
             current_col += colspan
+        header_rows.append(merged_row)
 
-        # Write column headers starting from row 2
-        for idx, col_name in enumerate(df.columns, start=1):
-            cell = ws.cell(row=2, column=idx)
-            cell.value = col_name
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-
-        start_row = 3  # Data starts from row 3
-    else:
-        # No merged headers; write column headers in row 1
-        for idx, col_name in enumerate(df.columns, start=1):
-            cell = ws.cell(row=1, column=idx)
-            cell.value = col_name
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-
-        start_row = 2  # Data starts from row 2
-
-    # Write data to worksheet
-    for r_idx, row in enumerate(dataframe_to_rows(df, index=False, header=False), start=start_row):
-        for c_idx, value in enumerate(row, start=1):
-            ws.cell(row=r_idx, column=c_idx, value=value)
+    # Column headers, row 2 under merged headers otherwise row 1
+    header_rows.append([styled_cell(col_name, Font(bold=True)) for col_name in df.columns])
+    header_row = len(header_rows)
+    start_row = header_row + 1
 
     # Freeze panes (freeze top rows)
     freeze_row = start_row if merged_headers else start_row - 1
-    ws.freeze_panes = ws.cell(row=freeze_row, column=1)
+    ws.freeze_panes = f"A{freeze_row}"
 
-    # Adjust column widths (optional)
-    for column_cells in ws.columns:
-        # Get the column letter using the column index
-        col_idx = column_cells[0].column  # Column index (integer)
-        col_letter = get_column_letter(col_idx)
-        # Calculate the maximum length needed
-        length = max(len(str(cell.value)) if cell.value is not None else 0 for cell in column_cells)
-        ws.column_dimensions[col_letter].width = length + 2
+    for row in header_rows:
+        ws.append(row)
 
-    ws = format_as_excel_table(ws, start_row - 1 if merged_headers else start_row - 2)
+    format_as_excel_table(ws, header_row, header_row + len(df), len(df.columns), column_names=df.columns)
 
-    # Save the workbook
-    wb.save(outpath)
+    # Save the styled workbook, then write it out with the data rows added
+    skeleton = io.BytesIO()
+    wb.save(skeleton)
+    _write_xlsx_with_rows(skeleton, outpath, _excel_row_xml(df, start_row))
     print(f"Excel file saved to {outpath}")
 
 
-def format_as_excel_table(worksheet, table_start_row=1):
+_ILLEGAL_XML_CHARS = r"[\x00-\x08\x0b\x0c\x0e-\x1f]"
+
+
+def _excel_cell_lookup(values: pd.Series):
+    """
+    Cell XML for one column as (codes, lookup): the XML for row i is lookup[codes[i]].
+    Each distinct value is rendered once, so cost scales with distinct values, not rows.
+    Numbers and booleans keep their type, everything else is written as text.
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    uniques = pd.Series(uniques)
+    if pd.api.types.is_bool_dtype(uniques):
+        cells = np.where(uniques.to_numpy(dtype=bool), '<c t="b"><v>1</v></c>', '<c t="b"><v>0</v></c>')
+    elif pd.api.types.is_numeric_dtype(uniques):
+        numbers = uniques.astype("float64").to_numpy()
+        text = pd.Series([repr(v) for v in uniques.tolist()], dtype=object)
+        cells = np.where(np.isfinite(numbers), "<c><v>" + text + "</v></c>", "<c/>")
+    else:
+        text = (uniques.astype(str)
+                .str.replace(_ILLEGAL_XML_CHARS, "", regex=True)
+                .str.replace("&", "&amp;", regex=False)
+                .str.replace("<", "&lt;", regex=False)
+                .str.replace(">", "&gt;", regex=False))
+        cells = ('<c t="inlineStr"><is><t xml:space="preserve">' + text + "</t></is></c>").to_numpy(dtype=object)
+    # Missing values (code -1) take the trailing empty cell; cells carry no reference, so
+    # an empty <c/> keeps the following cells in their columns
+    lookup = np.append(np.asarray(cells, dtype=object), "<c/>")
+    return codes, lookup
+
+
+def _excel_row_xml(df: pd.DataFrame, start_row: int, chunk_rows=20000):
+    """Yield sheetData <row> elements for the frame in chunks of encoded bytes."""
+    columns = [_excel_cell_lookup(df[col]) for col in df.columns]
+    for chunk_start in range(0, len(df), chunk_rows):
+        chunk_end = min(chunk_start + chunk_rows, len(df))
+        cells = [lookup[codes[chunk_start:chunk_end]] for codes, lookup in columns]
+        first_row = start_row + chunk_start
+        yield "".join([f'<row r="{first_row + i}">{"".join(row)}</row>'
+                       for i, row in enumerate(zip(*cells))]).encode("utf-8")
+
+
+def _write_xlsx_with_rows(skeleton, outpath, row_chunks):
+    """Copy a single-sheet xlsx package to outpath, streaming the row chunks into its sheetData."""
+    temp_path = f"{outpath}.tmp{os.getpid()}"
+    with zipfile.ZipFile(skeleton) as source, \
+            zipfile.ZipFile(temp_path, "w", compression=zipfile.ZIP_DEFLATED) as target:
+        for item in source.infolist():
+            data = source.read(item.filename)
+            if not item.filename.startswith("xl/worksheets/sheet"):
+                target.writestr(item, data)
+                continue
+            head, tail = data.rsplit(b"</sheetData>", 1)
+            with target.open(item.filename, "w", force_zip64=True) as sheet:
+                sheet.write(head)
+                for chunk in row_chunks:
+                    sheet.write(chunk)
+                sheet.write(b"</sheetData>" + tail)
+    os.replace(temp_path, outpath)
+
+
+def excel_column_widths(df: pd.DataFrame, merged_headers=None, padding=2) -> list:
+    """
+    Width for each column: the longest of its header and its values as text, plus padding.
+    Merged header text counts toward the first column it spans.
+    """
+    widths = []
+    for col_name in df.columns:
+        values = df[col_name].dropna()
+        longest = values.astype(str).str.len().max() if len(values) else 0
+        widths.append(max(int(longest), len(str(col_name))))
+
+    current_col = 0
+    for header in merged_headers or []:
+        if current_col < len(widths):
+            widths[current_col] = max(widths[current_col], len(str(header['text'])))
+        current_col += header.get('colspan', 1)
+    return [w + padding for w in widths]
+
+
+def format_as_excel_table(worksheet, table_start_row=1, table_end_row=None, table_end_col=None, column_names=None):
     # Create an Excel Table
     start_row = table_start_row
-    table_end_row = worksheet.max_row
+    # Write-only sheets cannot be read back, so callers pass the extent and header names
+    if table_end_row is None:
+        table_end_row = worksheet.max_row
     table_start_col = 1
-    table_end_col = worksheet.max_column
-    table_ref = f"{worksheet.cell(row=start_row, column=table_start_col).coordinate}:{worksheet.cell(row=table_end_row, column=table_end_col).coordinate}"
+    if table_end_col is None:
+        table_end_col = worksheet.max_column
+    table_ref = (f"{get_column_letter(table_start_col)}{start_row}:"
+                 f"{get_column_letter(table_end_col)}{max(table_end_row, start_row + 1)}")
 
     tab = Table(displayName="DataTable", ref=table_ref)
+    if column_names is not None:
+        tab.tableColumns = [TableColumn(id=i, name=str(name)) for i, name in enumerate(column_names, start=1)]
 
     # Add a table style
     style = TableStyleInfo(name="TableStyleMedium9", showFirstColumn=False,
                            showLastColumn=False, showRowStripes=True, showColumnStripes=False)
     tab.tableStyleInfo = style
 
-    worksheet.add_table(tab)
+    with warnings.catch_warnings():
+        if column_names is not None:
+            # Openpyxl warns on every write-only table, even when the columns are set
+            warnings.filterwarnings("ignore", "In write-only mode", UserWarning)
+        worksheet.add_table(tab)
 
     return worksheet
 
@@ -293,6 +696,49 @@ def df_to_json(data, out_loc: str, filename: str = None):
         json.dump(dicted, f, indent=2)
 
 
+def df_to_feather(data, out_loc: str, filename: str = None) -> str:
+    """
+    Write the attribute table as an uncompressed Arrow IPC (Feather v2) file.
+    Uncompressed buffers can be memory-mapped by the server and read straight
+    into typed arrays by the web worker, so neither side parses text.
+    :param data: DataFrame or GeoDataFrame (geometry is dropped)
+    :param out_loc: output folder, or the full .arrow path
+    :param filename: file name without extension
+    :return: output path
+    """
+    if isinstance(data, gpd.GeoDataFrame):
+        df = pd.DataFrame(data.drop(columns='geometry'))
+    elif isinstance(data, pd.DataFrame):
+        df = data
+    else:
+        raise ValueError("Data must be a GeoDataFrame or DataFrame")
+
+    if ".arrow" in out_loc:
+        out_loc, file = os.path.split(out_loc)
+        filename, ext = os.path.splitext(file)
+    outpath_table = os.path.normpath(os.path.join(out_loc, filename + ".arrow"))
+    os.makedirs(os.path.dirname(outpath_table), exist_ok=True)
+
+    df = df.rename(columns=str)
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Object columns holding mixed types (e.g. numbers and strings) are written as text
+        mixed = {c: "string" for c in df.columns if df[c].dtype == object}
+        table = pa.Table.from_pandas(df.astype(mixed), preserve_index=False)
+
+    # Write next to the target and swap in, so readers never map a partial file
+    temp_path = f"{outpath_table}.tmp{os.getpid()}"
+    feather.write_feather(table, temp_path, compression="uncompressed")
+    os.replace(temp_path, outpath_table)
+    return outpath_table
+
+
+def feather_to_df(path: str) -> pd.DataFrame:
+    """Read an Arrow IPC / Feather file written by df_to_feather, memory-mapped."""
+    return feather.read_table(path, memory_map=True).to_pandas()
+
+
 def df_to_metadata(data, out_loc: str, filename: str = None):
     # Ensure data is a GeoDataFrame or DataFrame
     if isinstance(data, gpd.GeoDataFrame):
@@ -408,6 +854,48 @@ def json_to_toml(input_json: Union[json, str], toml_file: str = None
     return data, toml_file
 
 
+def read_last_modified(marker_file: str) -> dict:
+    """
+    Read the data version marker (simple 'key: value' YAML)
+    :param marker_file:
+    :return: marker fields
+    """
+    fields = {}
+    if not os.path.exists(marker_file):
+        return fields
+    with open(marker_file, "r") as f:
+        for line in f:
+            if ":" not in line:
+                continue
+            key, value = line.split(":", 1)
+            fields[key.strip()] = value.strip()
+    return fields
+
+
+def update_last_modified(marker_file: str) -> float:
+    """
+    Stamp the data version marker with the current time and bump its version counter
+    :param marker_file:
+    :return: the new timestamp
+    """
+    fields = read_last_modified(marker_file)
+    version = int(fields["version"]) + 1 if fields.get("version", "").isdigit() else 1
+    timestamp = datetime.datetime.now().timestamp()
+    os.makedirs(os.path.dirname(marker_file) or ".", exist_ok=True)
+    temp_path = f"{marker_file}.tmp{os.getpid()}"
+    with open(temp_path, "w") as f:
+        f.write(f"last_modified: {timestamp}\n")
+        f.write(f"version: {version}\n")
+    os.replace(temp_path, marker_file)
+    return timestamp
+
+
+def read_data_version(marker_file: str) -> int:
+    """Version counter from the data version marker, 0 if it has never been bumped"""
+    version = read_last_modified(marker_file).get("version", "")
+    return int(version) if version.isdigit() else 0
+
+
 def toml_to_json(toml_file: str, json_file: str = None
                  ) -> Tuple[dict, str]:
     """
@@ -3,7 +3,10 @@ import pandas as pd
 import os
 import datetime
 from filter_sort_select import define_one_by_another
-from read_write_df import df_to_excel, df_to_json, StatusTableManager, gdf_to_shapefile
+from read_write_df import (df_to_excel, df_to_json, df_to_feather, StatusTableManager, gdf_to_shapefile,
+                           update_last_modified)
+from precompress import write_precompressed
+from publish import Publication
 
 
 class ProjectStatusUpdater:
@@ -13,6 +16,10 @@ class ProjectStatusUpdater:
                  other_column: str = None, other_status: str = None):
         self.excel_file = "../data/tables/IA_BLE_Tracking.xlsx"
         self.tracking_file = "../data/spatial/IA_BLE_Tracking.geojson"
+        self.attributes_arrow = "../data/spatial/IA_BLE_Tracking_attributes.arrow"
+        self.attributes_csv = "../data/spatial/IA_BLE_Tracking_attributes.csv"
+        self.publish_lock = "../data/.publish.lock"
+        self.version_marker = "../data/tables/last_modified.yaml"
         self.shapefile = "../data/esri_exports/IA_BLE_Tracking.shp"
         self.sheet_name = "Tracking_Main"
         self.last_modified = None
@@ -154,27 +161,35 @@ class ProjectStatusUpdater:
         self.tracking_gdf["FRP_Perc_Complete_Legend"] = self.tracking_gdf.loc[
             :, "FRP_Perc_Complete"].apply(lambda x: f"{int(float(x))}%" if x not in [None, ""] else "")
 
-        # Export the GeoDataFrame to GeoJSON
-        self.tracking_gdf.to_file(self.tracking_file, driver="GeoJSON")
-
-        # Convert the GeoDataFrame to a DataFrame
-        tracking_df = self.tracking_gdf.drop(columns="geometry")
-
-        # Eport GDF to Shapefile
-        self._format_for_shapefile()
-        gdf_to_shapefile(self.tracking_gdf, self.shapefile)
-
-        # Convert dates to strings for Excel export
-        self.tracking_gdf = tracking_df
-        self._format_dates_to_str()
-
-        df_to_json(self.tracking_gdf, self.tracking_file.replace(".geojson", ".json"))
-
-        # Export the DataFrame to Excel
-        self._format_for_excel(sort=True)
-        excel_dir, excel_file = os.path.split(self.excel_file)
-        df_to_excel(self.tracking_gdf, excel_dir, excel_file, self.sheet_name)
-
+        # Write every output to staging under the publish lock (shared with the web app),
+        # then swap them in together and bump the data version
+        with Publication(self.publish_lock, self.version_marker, bump_version=update_last_modified) as pub:
+            # Export the GeoDataFrame to GeoJSON
+            staged_geojson = pub.stage(self.tracking_file)
+            self.tracking_gdf.to_file(staged_geojson, driver="GeoJSON")
+
+            # Convert the GeoDataFrame to a DataFrame
+            tracking_df = self.tracking_gdf.drop(columns="geometry")
+            staged_csv = pub.stage(self.attributes_csv)
+            tracking_df.to_csv(staged_csv, index=False)
+            staged_arrow = df_to_feather(tracking_df, pub.stage(self.attributes_arrow))
+            for staged_path in [staged_geojson, staged_csv, staged_arrow]:
+                write_precompressed(staged_path)
+
+            # Eport GDF to Shapefile
+            self._format_for_shapefile()
+            gdf_to_shapefile(self.tracking_gdf, pub.stage(self.shapefile))
+
+            # Convert dates to strings for Excel export
+            self.tracking_gdf = tracking_df
+            self._format_dates_to_str()
+
+            df_to_json(self.tracking_gdf, pub.stage(self.tracking_file.replace(".geojson", ".json")))
+
+            # Export the DataFrame to Excel
+            self._format_for_excel(sort=True)
+            excel_dir, excel_file = os.path.split(pub.stage(self.excel_file))
+            df_to_excel(self.tracking_gdf, excel_dir, excel_file, self.sheet_name)
 
 if __name__ == "__main__":
     PROJECT_WILDCARD_LIST = ["Copperas"]
@@ -0,0 +1,106 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from py.read_write_df import sort_codes
+
+
+class TableIndex:
+    """
+    Search and order indexes over one version of the tracking frame, for server-side paging.
+
+    Each column keeps a lower-cased text copy for substring search and lazily built sort
+    permutations. Search masks and orderings are memoized in small LRUs, so repeated
+    requests (paging through the same search) only pay for slicing out the page.
+    """
+
+    MAX_CACHED = 64
+
+    def __init__(self, df: pd.DataFrame):
+        self.frame = df
+        self.columns = [str(c) for c in df.columns]
+        self._text = {}
+        for col in df.columns:
+            values = df[col]
+            text = values.astype(object).where(values.notna(), "").astype(str)
+            self._text[str(col)] = text.str.lower().astype("string").reset_index(drop=True)
+        self._lock = threading.Lock()
+        self._masks = OrderedDict()
+        self._permutations = OrderedDict()
+
+    def __len__(self):
+        return len(self.frame)
+
+    def _memo(self, cache, key, build):
+        with self._lock:
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key]
+        value = build()
+        with self._lock:
+            cache[key] = value
+            while len(cache) > self.MAX_CACHED:
+                cache.popitem(last=False)
+        return value
+
+    def column_mask(self, column, value) -> np.ndarray:
+        """Rows whose column contains value (case-insensitive)."""
+        value = value.lower()
+        return self._memo(self._masks, (column, value),
+                          lambda: self._text[column].str.contains(value, regex=False).to_numpy(dtype=bool))
+
+    def global_mask(self, value, columns=None) -> np.ndarray:
+        """Rows where any of the searchable columns contains value."""
+        columns = tuple(c for c in (columns or self.columns) if c in self._text)
+
+        def build():
+            mask = np.zeros(len(self), dtype=bool)
+            for col in columns:
+                mask |= self.column_mask(col, value)
+            return mask
+
+        return self._memo(self._masks, ("*", columns, value.lower()), build)
+
+    def permutation(self, order) -> np.ndarray:
+        """Stable row order for [(column, ascending), ...], primary key first."""
+        order = tuple((c, bool(asc)) for c, asc in order if c in self._text)
+        if not order:
+            return np.arange(len(self))
+
+        def build():
+            codes = [sort_codes(self.frame[self._source_column(c)], asc) for c, asc in order]
+            return np.lexsort(codes[::-1])
+
+        return self._memo(self._permutations, order, build)
+
+    def _source_column(self, column):
+        return self.frame.columns[self.columns.index(column)]
+
+    def query(self, start=0, length=None, global_search="", column_searches=None, order=None,
+              searchable=None):
+        """
+        Filter, order and page the frame.
+        :param start: first row of the page
+        :param length: rows per page, None or negative for all rows
+        :param global_search: substring matched against all searchable columns
+        :param column_searches: {column: substring}
+        :param order: [(column, ascending), ...]
+        :param searchable: columns included in the global search
+        :return: (page DataFrame, number of rows after filtering)
+        """
+        mask = None
+        if global_search:
+            mask = self.global_mask(global_search, searchable)
+        for col, value in (column_searches or {}).items():
+            if value and col in self._text:
+                col_mask = self.column_mask(col, value)
+                mask = col_mask if mask is None else mask & col_mask
+
+        rows = self.permutation(order or [])
+        if mask is not None:
+            rows = rows[mask[rows]]
+
+        end = None if length is None or length < 0 else start + length
+        return self.frame.iloc[rows[start:end]], len(rows)
@@ -0,0 +1,137 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+
+class TrackingCacheEntry:
+    """One loaded version of the tracking attribute table."""
+
+    def __init__(self, frame, signature, version):
+        self.frame = frame  # Shared between requests, treat as read-only
+        self.signature = signature
+        self.version = version
+        self.loaded_at = time.time()
+        mtimes = [s[0] for s in signature[0] if s is not None]
+        self.last_modified = (datetime.fromtimestamp(max(mtimes) / 1e9, tz=timezone.utc).replace(microsecond=0)
+                              if mtimes else None)
+        # Filled in by the first complete response for this version
+        self.json_bytes = None
+        self.etag = None
+        self._derived = {}
+        self._derived_lock = threading.Lock()
+
+    def derived(self, key, build):
+        """Build an object from this version once (e.g. search indexes) and reuse it."""
+        with self._derived_lock:
+            if key not in self._derived:
+                self._derived[key] = build(self.frame)
+            return self._derived[key]
+
+    def peek_derived(self, key):
+        """The object derived under key if it was already built, else None; never builds."""
+        return self._derived.get(key)
+
+    def store_json(self, json_bytes: bytes):
+        """Keep the serialized table so later requests skip encoding and can use its ETag."""
+        self.etag = hashlib.blake2b(json_bytes, digest_size=16).hexdigest()
+        self.json_bytes = json_bytes
+
+
+class TrackingDataCache:
+    """
+    Process-wide cache of the typed, sorted tracking attribute table and its JSON.
+
+    The entry is keyed on the (mtime, size) signature of the source file and any
+    dependency files (e.g. the table metadata), plus a generation counter that
+    writers bump after replacing the data. A stale signature triggers a reload.
+    """
+
+    def __init__(self, path, loader, depends_on=None):
+        """
+        :param path: Source file of the tracking data (GeoJSON)
+        :param loader: Callable taking the path and returning the typed, sorted DataFrame
+        :param depends_on: Other files whose changes should invalidate the cache
+        """
+        self.path = path
+        self.loader = loader
+        self.depends_on = list(depends_on or [])
+        self._lock = threading.Lock()
+        self._entry = None
+        self._generation = 0
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _signature(self):
+        files = tuple(self._stat(p) for p in [self.path] + self.depends_on)
+        return files, self._generation
+
+    def data_version(self):
+        """
+        Hashable token for the current state of the source files, without loading them. Only
+        file signatures, not the in-process generation, so every worker process agrees on it.
+        """
+        return self._signature()[0]
+
+    def peek(self):
+        """The current entry if it is loaded and up to date, else None; never loads."""
+        entry = self._entry
+        if entry is not None and entry.signature == self._signature():
+            self.hits += 1
+            return entry
+        return None
+
+    def get(self) -> TrackingCacheEntry:
+        """Return the current entry, reloading it if any source changed."""
+        signature = self._signature()
+        entry = self._entry
+        if entry is not None and entry.signature == signature:
+            self.hits += 1
+            return entry
+
+        # Load under the lock so concurrent misses only parse the file once
+        with self._lock:
+            signature = self._signature()
+            entry = self._entry
+            if entry is not None and entry.signature == signature:
+                self.hits += 1
+                return entry
+
+            self.misses += 1
+            start = time.perf_counter()
+            df = self.loader(self.path)
+            self._version += 1
+            entry = TrackingCacheEntry(df, signature, self._version)
+            self._entry = entry
+            logging.info(f"Loaded tracking cache v{entry.version} ({len(df)} rows) "
+                         f"in {time.perf_counter() - start:.3f}s")
+            return entry
+
+    def bump(self):
+        """Invalidate the current entry, e.g. after an upload replaced the data."""
+        with self._lock:
+            self._generation += 1
+            self._entry = None
+
+    def stats(self) -> dict:
+        entry = self._entry
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "version": entry.version if entry else None,
+            "rows": len(entry.frame) if entry else 0,
+            "bytes": len(entry.json_bytes) if entry and entry.json_bytes else 0,
+            "etag": entry.etag if entry else None,
+            "loaded_at": entry.loaded_at if entry else None,
+        }
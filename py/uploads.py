@@ -0,0 +1,87 @@
+import io
+import os
+import zipfile
+
+import geopandas as gpd
+from werkzeug.utils import secure_filename
+
+SHAPEFILE_PARTS = {'shp', 'dbf', 'shx', 'prj', 'cpg'}
+GEOJSON_EXTENSIONS = {'geojson', 'json'}
+ALLOWED_EXTENSIONS = SHAPEFILE_PARTS | GEOJSON_EXTENSIONS | {'zip'}
+
+
+class UploadError(ValueError):
+    """An upload that cannot be read; the message is shown to the user."""
+
+
+def file_extension(filename) -> str:
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+
+
+def allowed_file(filename) -> bool:
+    return file_extension(filename) in ALLOWED_EXTENSIONS
+
+
+def read_parts(files) -> dict:
+    """
+    Read uploaded files (werkzeug FileStorage) into memory.
+    :return: {secure file name: bytes}
+    """
+    parts = {}
+    for file in files:
+        if not allowed_file(file.filename):
+            raise UploadError(f'File type not allowed: {file.filename}')
+        parts[secure_filename(file.filename)] = file.read()
+    return parts
+
+
+def _zip_members(data) -> dict:
+    """File members of an uploaded zip, by name; folders and macOS metadata are skipped."""
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            return {info.filename: archive.read(info) for info in archive.infolist()
+                    if not info.is_dir() and not info.filename.startswith("__MACOSX/")}
+    except zipfile.BadZipFile:
+        raise UploadError('Uploaded .zip file is not a valid zip archive')
+
+
+def _shapefile_zip(parts, shp_name) -> bytes:
+    """The .shp and its same-stem siblings as an uncompressed zip, which GDAL reads from memory."""
+    stem = os.path.splitext(shp_name)[0].lower()
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for name, data in parts.items():
+            part_stem, ext = os.path.splitext(name)
+            if part_stem.lower() == stem and ext[1:].lower() in SHAPEFILE_PARTS:
+                archive.writestr(f"upload{ext.lower()}", data)
+    return buffer.getvalue()
+
+
+def read_upload(parts) -> tuple:
+    """
+    Read an upload held in memory: shapefile parts, a zipped shapefile or a GeoJSON.
+    :param parts: {file name: bytes}, as returned by read_parts
+    :return: (GeoDataFrame, column format of the upload: 'shapefile' or 'geojson')
+    """
+    # Unpack zips so shapefiles in a subfolder and zipped GeoJSON are handled like loose files
+    files = {}
+    for name, data in parts.items():
+        if file_extension(name) == 'zip':
+            for member, member_data in _zip_members(data).items():
+                files[os.path.basename(member)] = member_data
+        else:
+            files[name] = data
+
+    shp_files = [name for name in files if file_extension(name) == 'shp']
+    if len(shp_files) > 1:
+        raise UploadError(f'Upload one shapefile at a time, found {len(shp_files)}: {", ".join(shp_files)}')
+    if shp_files:
+        return gpd.read_file(io.BytesIO(_shapefile_zip(files, shp_files[0]))), "shapefile"
+
+    geojson_files = [name for name in files if file_extension(name) in GEOJSON_EXTENSIONS]
+    if len(geojson_files) > 1:
+        raise UploadError(f'Upload one GeoJSON at a time, found {len(geojson_files)}')
+    if geojson_files:
+        return gpd.read_file(io.BytesIO(files[geojson_files[0]])), "geojson"
+
+    raise UploadError('No .shp, .zip or .geojson file found among uploaded files')
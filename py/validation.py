@@ -0,0 +1,273 @@
+import logging
+import re
+import time
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from py.read_write_df import EMPTY_VALUES, TableMetadata
+
+
+class ValidationReport:
+    """
+    Errors found by a ValidationPlan. Every failing row is counted per column and rule;
+    the first max_errors are listed with their row, key and value.
+    """
+
+    def __init__(self, key_column=None, max_errors=500):
+        self.key_column = key_column
+        self.max_errors = max_errors
+        self.errors = []
+        self.counts = {}  # "column: rule" -> rows failing
+        self.checks = []
+        self.skipped = []
+        self.timed_out = False
+        self.seconds = 0.0
+        self.n_rows = 0
+        self.row_numbers = None  # 1-based row number of each validated row; None for its position
+
+    @property
+    def ok(self) -> bool:
+        return not self.counts and not self.timed_out
+
+    @property
+    def error_count(self) -> int:
+        return sum(self.counts.values())
+
+    def add(self, column, rule, message, rows=None, values=None, keys=None):
+        """
+        Record a failed check.
+        :param rows: positions of the failing rows; None for an error about the whole column
+        :param values: the failing values, aligned with rows
+        :param keys: the failing rows' key values, aligned with rows
+        """
+        n_failed = 1 if rows is None else len(rows)
+        if not n_failed:
+            return
+        self.counts[f"{column}: {rule}"] = self.counts.get(f"{column}: {rule}", 0) + n_failed
+
+        room = self.max_errors - len(self.errors)
+        if room <= 0:
+            return
+        if rows is None:
+            self.errors.append({"row": None, "key": None, "column": column, "rule": rule,
+                                "value": None, "message": message})
+            return
+        for i in range(min(room, n_failed)):
+            self.errors.append({
+                # 1-based, as in the uploaded table
+                "row": int(rows[i]) + 1 if self.row_numbers is None else int(self.row_numbers[rows[i]]),
+                "key": None if keys is None else _display(keys[i]),
+                "column": column,
+                "rule": rule,
+                "value": None if values is None else _display(values[i]),
+                "message": message,
+            })
+
+    def summary(self) -> str:
+        if self.timed_out:
+            return (f"Validation did not finish within its time budget "
+                    f"({len(self.skipped)} checks skipped, {self.error_count} errors so far)")
+        if self.ok:
+            return f"{self.n_rows} rows passed {len(self.checks)} checks"
+        worst = sorted(self.counts.items(), key=lambda item: -item[1])[:3]
+        return f"{self.error_count} validation errors: " + "; ".join(f"{name} ({n})" for name, n in worst)
+
+    def to_dict(self) -> dict:
+        return {
+            "ok": self.ok,
+            "summary": self.summary(),
+            "rows": self.n_rows,
+            "error_count": self.error_count,
+            "counts": self.counts,
+            "errors": sorted(self.errors, key=lambda e: e["row"] or 0),
+            "truncated": self.error_count > len(self.errors),
+            "timed_out": self.timed_out,
+            "skipped": self.skipped,
+            "seconds": round(self.seconds, 4),
+        }
+
+
+def _display(value):
+    if value is None or (not isinstance(value, (list, tuple, np.ndarray)) and pd.isna(value)):
+        return None
+    return value if isinstance(value, (int, float, str, bool)) else str(value)
+
+
+class _ColumnValues:
+    """One column under validation, factorized to stripped text once and shared by its checks."""
+
+    def __init__(self, values: pd.Series):
+        self.values = values
+        self._factorized = None
+
+    @property
+    def factorized(self):
+        """(codes, unique text values); nulls and empty placeholders get code -1."""
+        if self._factorized is None:
+            codes, uniques = pd.factorize(self.values, use_na_sentinel=True)
+            text = pd.Series(np.asarray(uniques, dtype=object), dtype=object).astype(str).str.strip()
+            empty = text.isin(EMPTY_VALUES).to_numpy()
+            if empty.any():
+                # Values that only differ by padding share a text value but keep their own codes
+                codes = np.where(empty[np.maximum(codes, 0)] & (codes >= 0), -1, codes)
+            self._factorized = (codes, text.where(~empty))
+        return self._factorized
+
+    def row_mask(self, unique_mask) -> np.ndarray:
+        """Rows whose unique value is flagged in unique_mask; missing values are never flagged."""
+        codes, _ = self.factorized
+        return np.append(np.asarray(unique_mask, dtype=bool), False)[codes]
+
+    def take(self, idx) -> np.ndarray:
+        return self.values.iloc[idx].to_numpy(dtype=object)
+
+
+class ValidationPlan:
+    """
+    Checks compiled from the metadata for one column format.
+
+    Each column's "dtype" is checked, plus the rules in its optional "validate" object:
+        "required": true            the column must exist and every row must have a value
+        "unique": true              no two rows share a value
+        "allowed": ["YES", "NO"]    values must be one of these
+        "pattern": "\\d{8}"         values must fully match the regular expression
+        "min"/"max": "2015-01-01"   bounds for date (or numeric) values
+    Geometry columns must hold valid, non-empty geometries. Every check works on
+    whole columns, on the unique values where it parses, so large uploads stay fast.
+    """
+
+    def __init__(self, table_metadata: TableMetadata, column_format="geojson"):
+        self.column_format = column_format
+        self.rules = []  # (column, dtype, rules)
+        for key, info in table_metadata.metadata["columns"].items():
+            column = info.get(column_format)
+            if column is None:
+                continue
+            self.rules.append((column, info.get("dtype"), dict(info.get("validate", {}))))
+        self.key_column = next((column for column, _, rules in self.rules if rules.get("unique")), None)
+        self._patterns = {column: re.compile(rules["pattern"]) for column, _, rules in self.rules
+                          if "pattern" in rules}
+
+    def validate(self, df, time_budget=10.0, max_errors=500, row_numbers=None) -> ValidationReport:
+        """
+        Run every check on df, stopping at the time budget.
+        :param df: table with columns named in the plan's format, before type conversion
+        :param time_budget: seconds after which the remaining checks are skipped
+        :param max_errors: failing rows listed in the report (all are counted)
+        :param row_numbers: 1-based row number in the uploaded table of each row of df, if rows were
+                            dropped before validating; by default rows are numbered by position
+        """
+        start = time.perf_counter()
+        report = ValidationReport(self.key_column, max_errors)
+        report.n_rows = len(df)
+        if row_numbers is not None:
+            report.row_numbers = np.asarray(row_numbers)
+        keys = df[self.key_column].to_numpy(dtype=object) if self.key_column in df.columns else None
+        columns = {}
+
+        checks = []
+        for column, dtype, rules in self.rules:
+            if column not in df.columns:
+                if rules.get("required"):
+                    report.add(column, "required", f"Required column {column} is missing")
+                continue
+            if dtype == "geometry":
+                checks.append((self._check_geometry, column, dtype, rules))
+                continue
+            if rules.get("required"):
+                checks.append((self._check_required, column, dtype, rules))
+            if dtype in ("date", "numeric"):
+                checks.append((self._check_values, column, dtype, rules))
+            if "allowed" in rules:
+                checks.append((self._check_allowed, column, dtype, rules))
+            if column in self._patterns:
+                checks.append((self._check_pattern, column, dtype, rules))
+            if rules.get("unique"):
+                checks.append((self._check_unique, column, dtype, rules))
+
+        for i, (check, column, dtype, rules) in enumerate(checks):
+            name = f"{column}: {check.__name__.removeprefix('_check_')}"
+            if time.perf_counter() - start > time_budget:
+                report.timed_out = True
+                report.skipped = [f"{c}: {chk.__name__.removeprefix('_check_')}" for chk, c, _, _ in checks[i:]]
+                break
+            check(report, columns.setdefault(column, _ColumnValues(df[column])), column, dtype, rules, keys)
+            report.checks.append(name)
+
+        report.seconds = time.perf_counter() - start
+        if not report.ok:
+            logging.warning(f"Upload validation: {report.summary()}")
+        return report
+
+    @staticmethod
+    def _fail(report, column, rule, message, failed, values: _ColumnValues, keys, shown=None):
+        """Report the rows flagged in failed, listing shown (or the column's own values) for each."""
+        idx = np.flatnonzero(failed)
+        if not len(idx):
+            return
+        report.add(column, rule, message, idx, values.take(idx) if shown is None else shown[idx],
+                   None if keys is None else keys[idx])
+
+    def _check_required(self, report, values, column, dtype, rules, keys):
+        codes, _ = values.factorized
+        self._fail(report, column, "required", f"{column} is required", codes < 0, values, keys)
+
+    def _check_values(self, report, values, column, dtype, rules, keys):
+        """Dates and numbers: parse each unique value once, then check parse failures and bounds."""
+        _, uniques = values.factorized
+        present = uniques.notna().to_numpy()
+        if dtype == "date":
+            parsed = pd.to_datetime(uniques, errors="coerce", format="mixed", utc=True).dt.tz_localize(None)
+            bound = pd.Timestamp
+        else:
+            parsed = pd.to_numeric(uniques, errors="coerce")
+            bound = float
+
+        unparsed = present & parsed.isna().to_numpy()
+        self._fail(report, column, dtype, f"{column} is not a valid {dtype}", values.row_mask(unparsed), values, keys)
+
+        out_of_range = np.zeros(len(parsed), dtype=bool)
+        if "min" in rules:
+            out_of_range |= (parsed < bound(rules["min"])).fillna(False).to_numpy(dtype=bool)
+        if "max" in rules:
+            out_of_range |= (parsed > bound(rules["max"])).fillna(False).to_numpy(dtype=bool)
+        limits = f"{rules.get('min', '')} to {rules.get('max', '')}".strip()
+        self._fail(report, column, "range", f"{column} is outside {limits}", values.row_mask(out_of_range),
+                   values, keys)
+
+    def _check_allowed(self, report, values, column, dtype, rules, keys):
+        _, uniques = values.factorized
+        failed = (uniques.notna() & ~uniques.isin([str(v) for v in rules["allowed"]])).to_numpy(dtype=bool)
+        self._fail(report, column, "allowed", f"{column} must be one of: {', '.join(map(str, rules['allowed']))}",
+                   values.row_mask(failed), values, keys)
+
+    def _check_pattern(self, report, values, column, dtype, rules, keys):
+        _, uniques = values.factorized
+        pattern = self._patterns[column]
+        failed = np.array([isinstance(text, str) and pattern.fullmatch(text) is None for text in uniques],
+                          dtype=bool)
+        self._fail(report, column, "pattern", f"{column} does not match {rules['pattern']}",
+                   values.row_mask(failed), values, keys)
+
+    def _check_unique(self, report, values, column, dtype, rules, keys):
+        codes, uniques = values.factorized
+        # Padded variants of one value have separate codes, so count on the text value
+        _, text_codes = np.unique(uniques.fillna("").to_numpy(dtype=str), return_inverse=True)
+        row_text = np.where(codes >= 0, text_codes.ravel()[np.maximum(codes, 0)], -1)
+        counts = np.bincount(row_text[row_text >= 0], minlength=len(uniques) or 1)
+        failed = (row_text >= 0) & (counts[np.maximum(row_text, 0)] > 1)
+        self._fail(report, column, "unique", f"{column} is not unique", failed, values, keys)
+
+    def _check_geometry(self, report, values, column, dtype, rules, keys):
+        geometries = values.values.to_numpy(dtype=object)
+        missing = shapely.is_missing(geometries) | shapely.is_empty(geometries)
+        invalid = ~missing & ~shapely.is_valid(geometries)
+        self._fail(report, column, "geometry", "Geometry is missing or empty", missing, values, keys,
+                   shown=np.full(len(geometries), None))
+        if invalid.any():
+            # Only the invalid geometries get the (slower) explanation
+            reasons = np.full(len(geometries), None, dtype=object)
+            reasons[invalid] = shapely.is_valid_reason(geometries[invalid])
+            self._fail(report, column, "geometry", "Geometry is invalid", invalid, values, keys, shown=reasons)
@@ -10,6 +10,7 @@ import {
     updateLegendOnVisibilityChange,
     populateLegend } from "/static/src/legendControls.js"
 import { handleUploadButtonClick } from "/static/src/uploadData.js";
+import { applyTrackingAttributes, subscribeToDataUpdates } from "/static/src/liveUpdates.js";
 import { handleExportButtonClick } from "/static/src/exportData.js";
 import {precisionRound} from "/static/src/maths.js";
 import { toggleTable, fetchAndDisplayData, updateButtonsPosition } from "/static/src/populateTable.js"
@@ -266,31 +267,9 @@ async function setupMap(map, sourcesMeta, csvUrl, trackingAttributes) {
             console.debug("Fetched attributes: ", trackingAttributes);
         }
         // Apply attributes to Mapbox feature states
-        Object.entries(trackingAttributes).forEach(([project_id, attributes]) => {
-            map.setFeatureState(
-                {
-                    source: 'ProjectAreas',
-                    id: project_id,
-                    sourceLayer: ProjectAreas
-                }, // Ensure id aligns with the `id` used in your vector tileset
-                attributes // Attributes as key-value pairs
-            );
-
-            const p02_mm_value = attributes.P02_MM
-            const isUploaded =
-                p02_mm_value !== null && p02_mm_value !== '' && p02_mm_value !== 'NaT';
-            map.setFeatureState(
-                {
-                    source: 'ProjectAreas',
-                    id: project_id,
-                    sourceLayer: ProjectAreas
-                },
-                {
-                  P02_MM: p02_mm_value,
-                  P02_Status: isUploaded ? 'Uploaded' : 'Not Uploaded'
-                }
-            )
-        });
+        applyTrackingAttributes(map, ProjectAreas, trackingAttributes);
+        // Then keep them current: each publish pushes the changed project_ids
+        subscribeToDataUpdates(map, ProjectAreas, csvUrl);
         if (LOG) {
             console.debug("Added tracking attributes.", trackingAttributes);
         }
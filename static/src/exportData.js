@@ -1,26 +1,31 @@
-export function handleExportButtonClick() {
-    // Send a request to the server to generate and download the Excel file
-    fetch('/export-excel', {
-        method: 'GET',
-    })
-    .then(response => {
-        if (!response.ok) {
-            throw new Error(`Server error: ${response.statusText}`);
-        }
-        return response.blob();
-    })
-    .then(blob => {
+import { submitJob, waitForJob } from "/static/src/jobs.js";
+
+export async function handleExportButtonClick() {
+    // Ask the server to build the Excel file in the background, then download it when ready
+    const exportButton = document.getElementById("export-excel-button");
+    const buttonText = exportButton ? exportButton.textContent : null;
+    try {
+        if (exportButton) { exportButton.disabled = true; }
+        const job = await waitForJob(await submitJob("export-excel"), (job) => {
+            if (exportButton) {
+                exportButton.textContent = `Exporting... ${Math.round((job.progress || 0) * 100)}%`;
+            }
+        });
+
         // Create a link to download the file
-        const url = window.URL.createObjectURL(new Blob([blob]));
         const link = document.createElement('a');
-        link.href = url;
+        link.href = job.result_url;
         link.setAttribute('download', 'IA_BLE_Tracking.xlsx');
         document.body.appendChild(link);
         link.click();
         link.parentNode.removeChild(link);
-    })
-    .catch(error => {
+    } catch (error) {
         console.error('Error downloading Excel file:', error);
         alert('Failed to download Excel file. Please try again.');
-    });
+    } finally {
+        if (exportButton) {
+            exportButton.disabled = false;
+            exportButton.textContent = buttonText;
+        }
+    }
 }
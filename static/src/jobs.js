@@ -0,0 +1,32 @@
+// static/src/jobs.js
+// Submit slow server work (exports, uploads) as background jobs and poll until they finish
+
+const POLL_INTERVAL_MS = 750;
+
+export async function submitJob(kind, body = undefined) {
+    const response = await fetch(`/jobs/${kind}`, { method: "POST", body: body });
+    const job = await response.json();
+    if (!response.ok) {
+        throw new Error(job.message || job.error || `Server error: ${response.statusText}`);
+    }
+    return job;
+}
+
+export async function waitForJob(job, onProgress = () => {}) {
+    while (job.status === "queued" || job.status === "running") {
+        onProgress(job);
+        await new Promise(resolve => setTimeout(resolve, POLL_INTERVAL_MS));
+        const response = await fetch(job.status_url, { cache: "no-store" });
+        if (!response.ok) {
+            throw new Error(`Failed to poll job: ${response.statusText}`);
+        }
+        job = await response.json();
+    }
+    onProgress(job);
+    if (job.status === "failed") {
+        const error = new Error(job.error || "Job failed");
+        error.details = job.details;  // e.g. the upload validation report
+        throw error;
+    }
+    return job;
+}
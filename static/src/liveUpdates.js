@@ -0,0 +1,78 @@
+// static/src/liveUpdates.js
+// Listen for data-version events from the server and patch the map and table with only what changed
+
+import { patchAttributesWorker, attributesVersionWorker } from "/static/src/workers/initWorkers.js";
+import { updateLastUpdatedTimestamp } from "/static/src/validateDataDir.js";
+
+const LOG = false;
+
+// Set the tracking attributes (and the derived P02 upload status) as feature states
+export function applyTrackingAttributes(map, sourceLayer, attributesById) {
+    Object.entries(attributesById).forEach(([project_id, attributes]) => {
+        const p02_mm_value = attributes.P02_MM
+        const isUploaded =
+            p02_mm_value !== null && p02_mm_value !== '' && p02_mm_value !== 'NaT';
+        map.setFeatureState(
+            {
+                source: 'ProjectAreas',
+                id: project_id,
+                sourceLayer: sourceLayer
+            }, // Ensure id aligns with the `id` used in your vector tileset
+            {
+                ...attributes, // Attributes as key-value pairs
+                P02_Status: isUploaded ? 'Uploaded' : 'Not Uploaded'
+            }
+        );
+    });
+}
+
+function refreshTable() {
+    // Server-side table: redraw the current page, keeping the paging position
+    if ($.fn.dataTable.isDataTable('#status-table')) {
+        $('#status-table').DataTable().ajax.reload(null, false);
+    }
+}
+
+export async function subscribeToDataUpdates(map, sourceLayer, csvUrl) {
+    if (!window.EventSource) {
+        console.warn("Live updates unavailable: EventSource not supported");
+        return null;
+    }
+    // Start from the version the attributes were loaded at, so a publish in between is not missed
+    const version = await attributesVersionWorker();
+    const events = new EventSource(version === null ? "/events" : `/events?since=${version}`);
+    let queue = Promise.resolve();
+
+    events.addEventListener("data-version", (message) => {
+        const event = JSON.parse(message.data);
+        if (LOG) { console.debug("Data version event: ", event); }
+
+        // Apply events one at a time, in version order
+        queue = queue.then(async () => {
+            const update = await patchAttributesWorker(event, csvUrl);
+            if (update.reload) {
+                map.removeFeatureState({ source: 'ProjectAreas', sourceLayer: sourceLayer });
+                applyTrackingAttributes(map, sourceLayer, update.attributes);
+            } else {
+                update.removed.forEach(project_id => map.removeFeatureState(
+                    { source: 'ProjectAreas', id: project_id, sourceLayer: sourceLayer }));
+                applyTrackingAttributes(map, sourceLayer, update.changed);
+            }
+            refreshTable();
+
+            const lastUpdated = document.getElementById("timestamp-text");
+            if (lastUpdated) {
+                await updateLastUpdatedTimestamp(fetch(csvUrl, { method: "HEAD", cache: "no-store" }), lastUpdated);
+            }
+            console.log(`Data version ${event.version} applied` +
+                (update.reload ? " (full reload)" : ` (${Object.keys(update.changed).length} rows changed)`));
+        }).catch((error) => {
+            console.error("Error applying data update:", error);
+        });
+    });
+    events.onerror = () => {
+        // The browser reconnects by itself and resumes from the last event id (or ?since= before the first)
+        if (LOG) { console.debug("Event stream interrupted, reconnecting"); }
+    };
+    return events;
+}
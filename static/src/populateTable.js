@@ -104,36 +104,15 @@ export async function fetchAndDisplayData(sourceData, attributesData) {
         }
         if (DEBUG_STATUS) {console.debug('sourceFormatMap:', sourceFormatMap);}
 
-        // Filter and Reorder Rows
-        const filteredAndOrderedData = Object.values(attributesData).map(row => {
-            // Filter out keys not in sourceFormatMap
-            const filteredRow = Object.keys(row)
-                .filter(key => key in sourceFormatMap)
-                .reduce((acc, key) => {
-                    acc[key] = row[key];
-                    return acc;
-                }, {});
-
-            // Reorder keys according to columnOrder
-            return columnOrder.reduce((acc, key) => {
-                if (key in filteredRow) {
-                    acc[key] = filteredRow[key];
-                } else {
-                    acc[key] = null; // Add missing keys with null
-                }
-                return acc;
-            }, {});
-        });
-
-        // Define columns for DataTable
+        // Define columns for DataTable. Rows are filtered, ordered and paged by the server,
+        // so the columns come straight from the metadata order.
         const invisibleColumns = ["geometry"];
-
-        if (DEBUG_STATUS) {console.debug('filteredAndOrderedData:', filteredAndOrderedData);}
-        const keys = Object.keys(filteredAndOrderedData[0] || {});
-        const columns = keys.map(key => ({
+        const columns = columnOrder.map(key => ({
             data: key, // Key used to match column with data field
             title: sourceFormatMap[key]?.excel || key, // Use the dictionary value for the title
             visible: !invisibleColumns.includes(key), // Hide columns if specified
+            searchable: !invisibleColumns.includes(key),
+            defaultContent: "",
             render: function (data) {
                 return data || ""; // Handle null/undefined values
             }
@@ -143,13 +122,19 @@ export async function fetchAndDisplayData(sourceData, attributesData) {
         if (DEBUG_STATUS) {console.debug('columns:', columns.length, columns);}
         await initDataTable(columns.length, columns);
         const dataTable = $('#status-table').DataTable({
-            data: filteredAndOrderedData,
-            paging: false,
+            serverSide: true,
+            processing: true,
+            ajax: '/data-table/server',
+            paging: true,
+            pageLength: 100,
+            lengthMenu: [25, 100, 500, 1000],
+            deferRender: true,
             columns: columns,
             destroy: true,
             autoWidth: true,
             responsive: true,
-            searching: false,
+            searching: true,
+            search: { return: true }, // Query the server on Enter rather than every keystroke
             orderClasses: true,
             // fixedHeader: true,
             createdRow: function (row, data, dataIndex) {
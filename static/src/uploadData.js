@@ -7,8 +7,7 @@ const dC = (message) => {
 };
 
 
-import { getMap, setTableLoaded } from '/static/src/mapManager.js';
-import { initSourcesWorker, initAttributesWorker } from "/static/src/workers/initWorkers.js";
+import { submitJob, waitForJob } from "/static/src/jobs.js";
 
 // Main function to handle the upload button click
 export function handleUploadButtonClick() {
@@ -34,14 +33,26 @@ async function handleFileSelection(event) {
         try {
             await uploadFilesToServer(files);
             alert("Files uploaded successfully!");
-            await updateMapData(); // Update map data source if needed
         } catch (error) {
             console.error("Error uploading files:", error);
-            alert("Failed to upload files. Please try again.");
+            alert(error.details ? formatValidationReport(error.details) : "Failed to upload files. Please try again.");
         }
     }
 }
 
+// Summarize an upload validation report: the first few failing rows, then the counts
+function formatValidationReport(report, maxRows = 10) {
+    const lines = [`Upload rejected: ${report.summary}`];
+    report.errors.slice(0, maxRows).forEach((e) => {
+        const where = e.row ? `Row ${e.row}${e.key ? ` (${e.key})` : ""}` : "Table";
+        lines.push(`${where}: ${e.message}${e.value !== null ? ` [${e.value}]` : ""}`);
+    });
+    if (report.error_count > maxRows) {
+        lines.push(`...and ${report.error_count - maxRows} more`);
+    }
+    return lines.join("\n");
+}
+
 // Function to validate the password
 async function validatePassword() {
     const userInput = prompt("Please enter the upload password:");
@@ -82,68 +93,20 @@ async function uploadFilesToServer(files) {
     for (let i = 0; i < files.length; i++) {
         formData.append('files', files[i]);
     }
+    // Only rows that differ from the current data are applied and recorded
+    formData.append('mode', 'incremental');
 
-    const response = await fetch("/update-tracking-geojson", {
-        method: "POST",
-        body: formData,
+    // Processed as a background job so the server stays responsive while it publishes
+    const job = await waitForJob(await submitJob("update-tracking-geojson", formData), (job) => {
+        dC(`Upload ${job.status}: ${job.message} (${Math.round((job.progress || 0) * 100)}%)`);
     });
 
-    if (!response.ok) {
-        const errorText = await response.text();
-        throw new Error(`Server error: ${response.statusText}\n${errorText}`);
-    }
-
-    const result = await response.json();
+    const result = job.result || {};
     if (!result.success) {
         throw new Error(`Server error: ${result.message}`);
     }
 
-    // Set table status to not loaded
-    setTableLoaded(false);
-}
-
-// Function to update the map data source
-async function updateMapData() {
-    // const socket = io(); // e.g., http://localhost:5000
-    //
-    // socket.on('connect', () => {
-    //     console.log('WebSocket connection established!');
-    // });
-    //
-    // socket.on('data_updated', async (data) => {
-    // console.log(data.message);
-    // Re-fetch the CSV attributes
-
-    const [jsonUrl, csvUrl] = ['/served/mapbox_metadata/mapbox_sources.json',
-    '/served/spatial/IA_BLE_Tracking_attributes.csv'];
-
-    try {
-
-        // Once updatedAttributes is ready, you can reapply the attributes using setFeatureState
-        const map = getMap(); // assuming getMap returns your Mapbox instance
-
-        // If your table is displayed somewhere, re-fetch that or update it as needed
-        const [sourcesData, attributesData] = await Promise.all([
-            initSourcesWorker(jsonUrl),
-            initAttributesWorker(csvUrl)
-        ]);
-
-        const vectorSourceNames = sourcesData.mapbox_vector_names;
-
-        dC("Fetched attributes: ", attributesData)
-
-        // Apply attributes to Mapbox feature states
-        Object.entries(attributesData).forEach(([project_id, attributes]) => {
-            map.setFeatureState(
-                {source: 'ProjectAreas', id: project_id, sourceLayer: vectorSourceNames.ProjectAreas}, // Ensure HUC8 aligns with the `id` used in your vector tileset
-                attributes // Attributes as key-value pairs
-            ); // TODO switch from HUC8 to project_id
-        });
-
-        console.log("Attributes reloaded from updated CSV.");
-    } catch (err) {
-        console.error("Error updating attributes from CSV:", err);
-    }
+    // The map and table are patched by the data-version event the publish sends (see liveUpdates.js)
 }
 
 // Function to create or retrieve the file input element
@@ -154,7 +117,7 @@ function getFileInput() {
         fileInput = document.createElement("input");
         fileInput.type = "file";
         fileInput.id = "file-upload-input";
-        fileInput.accept = ".geojson,.shp,.dbf,.shx,.prj,.cpg";
+        fileInput.accept = ".zip,.geojson,.json,.shp,.dbf,.shx,.prj,.cpg";
         fileInput.multiple = true;
         fileInput.style.display = "none"; // Hide the input element
         document.body.appendChild(fileInput);
@@ -1,30 +1,119 @@
 import * as Comlink from '/static/src/comlink.mjs';
 import * as d3 from "https://cdn.jsdelivr.net/npm/d3@7/+esm";
+import { tableFromIPC } from "https://cdn.jsdelivr.net/npm/apache-arrow@18/+esm";
 
 console.log("Worker initialized: Fetching data");
 
 
+// Columnar copy of the CSV, written alongside it by the publish scripts
+function arrowUrlFor(csvUrl) {
+    return csvUrl.replace(/\.csv$/, ".arrow");
+}
+
+// Data version the served file was read at (X-Data-Version), or null if the server did not say
+function dataVersionOf(response) {
+    const version = response.headers.get("X-Data-Version");
+    return version === null ? null : Number(version);
+}
+
+async function fetchArrowRows(arrowUrl) {
+    const response = await fetch(arrowUrl);
+    if (!response.ok) {
+        throw new Error(`Failed to fetch ${arrowUrl}: ${response.statusText}`);
+    }
+    currentVersion = dataVersionOf(response);
+    const table = tableFromIPC(new Uint8Array(await response.arrayBuffer()));
+
+    // Match d3.csv output: every value as a string, missing values as ""
+    const fields = table.schema.fields.map(field => field.name);
+    const columns = fields.map(name => table.getChild(name));
+    const rows = new Array(table.numRows);
+    for (let i = 0; i < table.numRows; i++) {
+        const row = {};
+        for (let c = 0; c < fields.length; c++) {
+            const value = columns[c].get(i);
+            row[fields[c]] = value === null || value === undefined ? "" : String(value);
+        }
+        rows[i] = row;
+    }
+    return rows;
+}
+
+async function fetchCsvRows(csvUrl) {
+    const response = await fetch(csvUrl);
+    if (!response.ok) {
+        throw new Error(`Failed to fetch ${csvUrl}: ${response.statusText}`);
+    }
+    currentVersion = dataVersionOf(response);
+    return d3.csvParse(await response.text());
+}
+
+// Attributes by project_id from the last full load, patched in place by data-version events
+let currentAttributes = null;
+// Data version of the last full load; live updates start from it
+let currentVersion = null;
+
+function rowsToAttributes(data) {
+    const attributes = {};
+    data.forEach((row) => {
+        const feat_id = row.project_id;
+        if (feat_id) {
+            attributes[feat_id] = { ...row };
+        }
+    });
+    return attributes;
+}
+
 async function fetchTrackingAttributes(csvUrl) {
     try {
-        const data = await d3.csv(csvUrl);
+        let data;
+        try {
+            data = await fetchArrowRows(arrowUrlFor(csvUrl));
+        } catch (arrowError) {
+            console.debug("Arrow attributes unavailable, reading CSV:", arrowError);
+            data = await fetchCsvRows(csvUrl);
+        }
         if (!data || !Array.isArray(data)) {
             throw new Error("Invalid or empty CSV data");
         }
 
-        const attributes = {};
-        data.forEach((row) => {
-            // console.debug(row)
-            const feat_id = row.project_id;
-            if (feat_id) {
-                attributes[feat_id] = { ...row };
-            }
-        });
-        return attributes;
+        currentAttributes = rowsToAttributes(data);
+        return currentAttributes;
     } catch (error) {
         console.error("Error fetching attributes:", error);
         return { error: error.message };
     }
 }
 
-// Expose the function for Comlink
-Comlink.expose({ fetchTrackingAttributes });
+// Apply a data-version event: fetch only the changed rows, or everything if the server asks for a reload.
+// Returns { reload, attributes } or { reload, changed: {project_id: row}, removed: [project_id] }
+async function patchTrackingAttributes(event, csvUrl) {
+    if (event.reload || currentAttributes === null) {
+        return { reload: true, attributes: await fetchTrackingAttributes(csvUrl) };
+    }
+    try {
+        const params = new URLSearchParams();
+        event.project_ids.forEach(id => params.append("project_id", id));
+        const response = await fetch(`/api/tracking-rows?${params}`, { cache: "no-store" });
+        if (!response.ok) {
+            throw new Error(`Failed to fetch changed rows: ${response.statusText}`);
+        }
+        const changed = rowsToAttributes(d3.csvParse(await response.text()));
+
+        // Requested ids missing from the response were deleted
+        const removed = event.project_ids.filter(id => !(id in changed));
+        Object.assign(currentAttributes, changed);
+        removed.forEach(id => delete currentAttributes[id]);
+        return { reload: false, changed: changed, removed: removed };
+    } catch (error) {
+        console.error("Error patching attributes, reloading:", error);
+        return { reload: true, attributes: await fetchTrackingAttributes(csvUrl) };
+    }
+}
+
+function getDataVersion() {
+    return currentVersion;
+}
+
+// Expose the functions for Comlink
+Comlink.expose({ fetchTrackingAttributes, patchTrackingAttributes, getDataVersion });
@@ -6,10 +6,27 @@ function initSourcesWorker(jsonUrl) {
     return api.fetchSourcesData(jsonUrl); // Call exposed function
 }
 
+// One attributes worker for the page, so live updates patch the attributes it already holds
+let attributesApi = null;
+
+function getAttributesWorker() {
+    if (!attributesApi) {
+        const worker = new Worker('/static/src/workers/fetchTrackingAttributes.js', { type: 'module'});
+        attributesApi = Comlink.wrap(worker);
+    }
+    return attributesApi;
+}
+
 function initAttributesWorker(csvUrl) {
-    const worker = new Worker('/static/src/workers/fetchTrackingAttributes.js', { type: 'module'});
-    const api = Comlink.wrap(worker);
-    return api.fetchTrackingAttributes(csvUrl); // Call exposed function
+    return getAttributesWorker().fetchTrackingAttributes(csvUrl); // Call exposed function
+}
+
+function patchAttributesWorker(event, csvUrl) {
+    return getAttributesWorker().patchTrackingAttributes(event, csvUrl);
+}
+
+function attributesVersionWorker() {
+    return getAttributesWorker().getDataVersion();
 }
 
 async function debugWorkers(jsonUrl, csvUrl) {
@@ -22,4 +39,4 @@ async function debugWorkers(jsonUrl, csvUrl) {
     // console.log("Attributes Data:", attributesData);
 }
 
-export { initSourcesWorker, initAttributesWorker, debugWorkers };
+export { initSourcesWorker, initAttributesWorker, patchAttributesWorker, attributesVersionWorker, debugWorkers };
@@ -0,0 +1,14 @@
+"""
+Production entry point: gunicorn --config gunicorn.conf.py wsgi:app
+
+With preload_app (gunicorn.conf.py) this module is imported once in the master process,
+so the caches warmed here are inherited by every worker through copy-on-write.
+"""
+import gc
+
+from app import app, warm_caches
+
+warm_caches()
+# Move everything loaded so far out of the garbage collector's generations, so collections
+# in the workers don't touch (and copy) the shared pages
+gc.freeze()